@@ -0,0 +1,460 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import Enum
+from typing import TYPE_CHECKING
+from typing import TypeVar
+from typing import cast
+
+from django.conf import settings
+from django.core.cache import BaseCache
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.http import HttpRequest
+from django.urls import get_script_prefix
+from django.urls import get_urlconf
+from django.urls import set_script_prefix
+from django.urls import set_urlconf
+from django.utils import translation
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from django_simple_nav.conf import app_settings
+
+from ._local_cache import LocalCache
+from ._local_cache import _local_caches
+from ._local_cache import get_local_cache
+from ._plan import get_nav_plan
+from ._request import parse_request
+
+if TYPE_CHECKING:
+    from ._plan import NavPlan
+    from .nav import Nav
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+KEY_PREFIX = "django_simple_nav"
+
+VERSION_KEY = f"{KEY_PREFIX}:version"
+
+# alias -> (next check, version)
+_versions: dict[str, tuple[float, int]] = {}
+
+# seconds between checks while waiting for another caller to fill an entry
+LOCK_POLL_INTERVAL = 0.05
+
+CACHE_MODES = frozenset({"path", "splice"})
+
+# (time the value goes stale, value) stored for each key, see `get_or_fill()`
+Entry = tuple[float | None, T]
+
+# (plan index, start, end, replacement) of a node's active markup in the base HTML
+Fragment = tuple[int, int, int, str]
+# the base HTML and its fragments, `None` for a nav that can't be spliced
+Splice = tuple[str, tuple[Fragment, ...]] | None
+
+
+class Unfilled(Enum):
+    """Returned when waiting for another caller to fill an entry timed out."""
+
+    UNFILLED = "unfilled"
+
+
+UNFILLED = Unfilled.UNFILLED
+
+# methods whose base implementations the cached output assumes
+NAV_METHODS = ("get_context_data", "get_template")
+
+
+@dataclass(frozen=True)
+class CacheOptions:
+    alias: str
+    cache: BaseCache
+    timeout: int | None
+    stale_timeout: int
+    lock_timeout: int
+    mode: str
+
+
+def get_cache_options(nav: Nav) -> CacheOptions | None:
+    """Return how `nav`'s HTML is cached, `None` if it isn't."""
+    enabled = nav.cache_enabled
+    if enabled is None:
+        enabled = app_settings.CACHE_ENABLED
+    if not enabled:
+        return None
+
+    alias = nav.cache_alias or app_settings.CACHE_ALIAS
+    timeout = nav.cache_timeout
+    if timeout is None:
+        timeout = app_settings.CACHE_TIMEOUT
+    stale_timeout = nav.cache_stale_timeout
+    if stale_timeout is None:
+        stale_timeout = app_settings.CACHE_STALE_TIMEOUT
+    mode = nav.cache_mode or app_settings.CACHE_MODE
+    if mode not in CACHE_MODES:
+        msg = f"Invalid cache mode for {nav.__class__!r}: {mode!r}. Expected one of {sorted(CACHE_MODES)}. Check its `cache_mode` or your `DJANGO_SIMPLE_NAV['CACHE_MODE']` setting."
+        raise ImproperlyConfigured(msg)
+    return CacheOptions(
+        alias=alias,
+        cache=caches[alias],
+        timeout=timeout,
+        stale_timeout=stale_timeout,
+        lock_timeout=app_settings.CACHE_LOCK_TIMEOUT,
+        mode=mode,
+    )
+
+
+def render_cached(
+    nav: Nav, request: HttpRequest, template_name: str | None = None
+) -> str | None:
+    """Render `nav` through its HTML cache, `None` if it can't be cached."""
+    if (options := get_cache_options(nav)) is None:
+        return None
+
+    # client-side active state leaves nothing to splice
+    if options.mode == "splice" and nav.active_mode != "client":
+        if (cache_key := get_cache_key(nav, request, template_name, True)) is None:
+            return None
+        html = render_spliced(nav, request, template_name, options, cache_key)
+        if html is not None:
+            return html
+        # not spliceable, cached per URL instead
+
+    if (cache_key := get_cache_key(nav, request, template_name)) is None:
+        return None
+    html = get_or_fill(options, cache_key, lambda: nav._render(request, template_name))
+    return mark_safe(html)
+
+
+def render_spliced(
+    nav: Nav,
+    request: HttpRequest,
+    template_name: str | None,
+    options: CacheOptions,
+    cache_key: str,
+) -> str | None:
+    """Render `nav` by splicing the active nodes into its cached base HTML.
+
+    The nav is rendered once per permission profile with no active nodes, and
+    once more for each node with only that node active. The difference
+    between the two is the node's active markup. Every request then only finds
+    its active nodes and splices their markup into the base HTML.
+    """
+    plan = cast("NavPlan", get_nav_plan(nav))
+    reachable = plan.get_reachable(request)
+    table = plan.get_url_table()
+
+    splice: Splice | Unfilled = get_or_fill(
+        options,
+        cache_key,
+        lambda: build_splice(nav, plan, request, template_name),
+        fallback=lambda: UNFILLED,
+    )
+    if splice is UNFILLED:
+        # building the splice again here would only add to a slow fill
+        return mark_safe(nav._render(request, template_name))
+    if splice is None:
+        return None
+
+    base, fragments = splice
+    active_nodes = plan.get_active_nodes(request, table, {}, reachable)
+    html = apply_fragments(
+        base, [fragment for fragment in fragments if fragment[0] in active_nodes]
+    )
+    return None if html is None else mark_safe(html)
+
+
+def get_or_fill(
+    options: CacheOptions,
+    cache_key: str,
+    compute: Callable[[], T],
+    fallback: Callable[[], T] | None = None,
+) -> T:
+    """Return the cached value of `cache_key`, computing it at most once.
+
+    Entries are stored with the time they go stale. For `stale_timeout`
+    seconds after that, the stale value is still returned while one thread
+    refreshes it in the background. On a miss, a lock added to the cache lets
+    a single caller compute the value while the others wait for it, for up to
+    `lock_timeout` seconds, instead of all computing it at once. Waiters that
+    time out return `fallback()`, or compute the value without storing it.
+
+    Keys include the alias's current version, see `invalidate_cache()`, and
+    entries are also kept in the process's `LocalCache` when it is enabled.
+    """
+    cache = options.cache
+    cache_key = f"{cache_key}:{get_version(options.alias)}"
+    lock_key = f"{cache_key}:lock"
+
+    local = get_local_cache(options.alias)
+    entry: Entry[T] | None = None
+    if local is not None:
+        entry = cast("Entry[T] | None", local.get(cache_key))
+    if entry is None:
+        entry = cast("Entry[T] | None", cache.get(cache_key))
+        if entry is not None and local is not None:
+            _set_local(local, cache_key, entry)
+    if entry is not None:
+        stale_at, value = entry
+        if stale_at is None or time.time() < stale_at:
+            return value
+
+        # serve the stale value while a single caller refreshes it
+        if cache.add(lock_key, True, options.lock_timeout):
+
+            def refresh() -> None:
+                try:
+                    _fill(options, cache_key, compute)
+                finally:
+                    cache.delete(lock_key)
+
+            refresh_in_background(refresh)
+        return value
+
+    if cache.add(lock_key, True, options.lock_timeout):
+        try:
+            return _fill(options, cache_key, compute)
+        finally:
+            cache.delete(lock_key)
+
+    # another caller is filling the entry, wait for it rather than duplicating
+    # the work
+    deadline = time.monotonic() + options.lock_timeout
+    while time.monotonic() < deadline and cache.get(lock_key) is not None:
+        time.sleep(LOCK_POLL_INTERVAL)
+        if (entry := cast("Entry[T] | None", cache.get(cache_key))) is not None:
+            return entry[1]
+    if (entry := cast("Entry[T] | None", cache.get(cache_key))) is not None:
+        return entry[1]
+    # the fill failed or took too long
+    return (fallback or compute)()
+
+
+def _fill(options: CacheOptions, cache_key: str, compute: Callable[[], T]) -> T:
+    value = compute()
+    timeout = options.timeout
+    entry: Entry[T] = (None if timeout is None else time.time() + timeout, value)
+    options.cache.set(
+        cache_key, entry, None if timeout is None else timeout + options.stale_timeout
+    )
+    if (local := get_local_cache(options.alias)) is not None:
+        _set_local(local, cache_key, entry)
+    return value
+
+
+def _set_local(local: LocalCache, cache_key: str, entry: Entry[object]) -> None:
+    # stale entries stay in the shared cache only, so a single caller refreshes them
+    timeout: float = app_settings.LOCAL_CACHE_TIMEOUT
+    if entry[0] is not None:
+        timeout = min(timeout, entry[0] - time.time())
+    local.set(cache_key, entry, timeout)
+
+
+def get_version(alias: str) -> int:
+    """Return the version of the `alias` nav cache, checked every few seconds.
+
+    The version is stored in the shared cache, so `invalidate_cache()` in one
+    process is seen by the others within `LOCAL_CACHE_VERSION_INTERVAL`.
+    """
+    now = time.monotonic()
+    checked = _versions.get(alias)
+    if checked is not None and now < checked[0]:
+        return checked[1]
+
+    cache = caches[alias]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # a new version rather than `1`, in case the key was evicted and other
+        # processes still use an older one
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY, 0)
+    _versions[alias] = (now + app_settings.LOCAL_CACHE_VERSION_INTERVAL, version)
+    return cast(int, version)
+
+
+def invalidate_cache(alias: str | None = None) -> None:
+    """Invalidate every cached nav in the `alias` cache, in every process.
+
+    Defaults to `DJANGO_SIMPLE_NAV['CACHE_ALIAS']`. Other processes stop using
+    their entries once they next check the version.
+    """
+    alias = alias or app_settings.CACHE_ALIAS
+    cache = caches[alias]
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+    _versions.pop(alias, None)
+    if (local := _local_caches.get(alias)) is not None:
+        local.clear()
+
+
+def get_cache_stats() -> dict[str, dict[str, int]]:
+    """Return the hits, misses, evictions and size of each local cache."""
+    return {alias: local.stats() for alias, local in _local_caches.items()}
+
+
+def refresh_in_background(refresh: Callable[[], None]) -> threading.Thread:
+    """Run `refresh` in a daemon thread, in the caller's language and urlconf."""
+    language = get_language()
+    urlconf = get_urlconf()
+    script_prefix = get_script_prefix()
+
+    def run() -> None:
+        set_urlconf(urlconf)
+        set_script_prefix(script_prefix)
+        try:
+            with translation.override(language):
+                refresh()
+        except Exception:
+            logger.exception("Failed to refresh a stale nav cache entry")
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=run, name="django-simple-nav-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+def build_splice(
+    nav: Nav, plan: NavPlan, request: HttpRequest, template_name: str | None
+) -> Splice:
+    """Render the base HTML and every node's active markup.
+
+    Returns `None` if the template doesn't render a node's active state
+    independently of the others. This is checked by comparing each node,
+    together with its ancestors, against a real render. Also `None` for navs
+    with more than `CACHE_SPLICE_MAX_NODES` visible nodes, since every node
+    takes a render of the whole nav.
+    """
+    reachable = plan.get_reachable(request)
+    if sum(reachable) > app_settings.CACHE_SPLICE_MAX_NODES:
+        # building the entry takes a render per node, each as long as the nav
+        return None
+    table = plan.get_url_table()
+
+    def render(active_nodes: set[int]) -> str:
+        items = plan.build(request, table, {}, reachable, active_nodes)
+        return nav._render_context({"items": items}, request, template_name)
+
+    base = render(set())
+    fragments: dict[int, Fragment] = {}
+    for idx in range(len(plan.nodes)):
+        if reachable[idx] and (html := render({idx})) != base:
+            fragments[idx] = _diff(idx, base, html)
+
+    for idx in range(len(plan.nodes)):
+        if not reachable[idx] or not plan.ancestors[idx]:
+            continue
+        active_nodes = {idx, *plan.ancestors[idx]}
+        node_fragments = [fragments[node] for node in active_nodes if node in fragments]
+        if len(node_fragments) < 2:
+            # a single node's markup is its own render, already compared
+            continue
+        if apply_fragments(base, node_fragments) != render(active_nodes):
+            return None
+
+    return base, tuple(sorted(fragments.values(), key=lambda fragment: fragment[1:3]))
+
+
+def apply_fragments(base: str, fragments: list[Fragment]) -> str | None:
+    """Splice `fragments` into `base`, `None` if any of them overlap."""
+    parts: list[str] = []
+    position = 0
+    previous_start = -1
+    for _, start, end, replacement in sorted(fragments, key=lambda f: f[1:3]):
+        if start < position or start == previous_start:
+            return None
+        parts.append(base[position:start])
+        parts.append(replacement)
+        position = end
+        previous_start = start
+    parts.append(base[position:])
+    return "".join(parts)
+
+
+def _diff(idx: int, base: str, html: str) -> Fragment:
+    limit = min(len(base), len(html))
+    prefix = _common_length(lambda n: base[:n] == html[:n], limit)
+    suffix = _common_length(
+        lambda n: base[len(base) - n :] == html[len(html) - n :], limit - prefix
+    )
+    return (idx, prefix, len(base) - suffix, html[prefix : len(html) - suffix])
+
+
+def _common_length(matches: Callable[[int], bool], limit: int) -> int:
+    # binary search on slice comparisons, which are much faster than a
+    # character by character loop for long HTML
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if matches(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def get_cache_key(
+    nav: Nav,
+    request: HttpRequest,
+    template_name: str | None = None,
+    splice: bool = False,
+) -> str | None:
+    """Return the key of `nav`'s rendered HTML for `request`.
+
+    Everything the output depends on is part of the key: the template, the
+    nav's definition, the request's filtered tree, everything active matching
+    compares and the active language. In splice mode, or when `active.js`
+    marks the active items, the request's URL is left out. Returns `None` when
+    the output can't be cached: the nav isn't compiled, overrides how it is
+    rendered, has callable URLs, or a callable permission opted out with
+    `cacheable = False`.
+    """
+    from .nav import Nav
+
+    nav_class = type(nav)
+    if any(getattr(nav_class, name) is not getattr(Nav, name) for name in NAV_METHODS):
+        return None
+
+    plan = get_nav_plan(nav)
+    if plan is None or plan.get_url_table().dynamic_nodes:
+        return None
+
+    permission_key = plan.get_permission_key(request)
+    if permission_key is None:
+        return None
+
+    parts: tuple[object, ...] = (
+        template_name or nav.get_template_name(),
+        plan.definition_hash,
+        permission_key,
+        get_language(),
+        get_urlconf(),
+        get_script_prefix(),
+        settings.APPEND_SLASH,
+    )
+    if not splice and nav.active_mode != "client":
+        parsed_request = parse_request(request)
+        resolver_match = getattr(request, "resolver_match", None)
+        parts += (
+            parsed_request.scheme,
+            parsed_request.netloc,
+            parsed_request.path,
+            parsed_request.query_key,
+            resolver_match.view_name if plan.view_index and resolver_match else None,
+        )
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+    mode = "splice" if splice else "path"
+    return (
+        f"{KEY_PREFIX}:{mode}:{nav_class.__module__}.{nav_class.__qualname__}:{digest}"
+    )
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import TYPE_CHECKING
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.utils.safestring import SafeString
+
+from ._request import QueryPolicy
+from ._urls import split_url
+
+if TYPE_CHECKING:
+    from .nav import NavGroup
+    from .nav import NavItem
+
+ACTIVE_MODES = frozenset({"server", "client"})
+
+
+def node_prefix(value: str) -> str:
+    """Return a short prefix for node ids, unique to a nav definition."""
+    return hashlib.sha256(value.encode()).hexdigest()[:8]
+
+
+def match_attrs(
+    item: NavGroup | NavItem,
+    url: str,
+    policy: QueryPolicy,
+    node_id: str,
+    parent_id: str | None = None,
+) -> SafeString:
+    """Return the data attributes `active.js` matches `item` with.
+
+    The item's URL is normalized the same way the server compares it: the
+    trailing slash is applied and the query string is sorted, so the script
+    only compares strings. `match="view"` items compare their URL, like on the
+    server when a request was never resolved.
+    """
+    attrs: dict[str, str] = {"data-nav-node": node_id}
+    if parent_id is not None:
+        attrs["data-nav-parent"] = parent_id
+
+    if url:
+        parsed_url, url_query = split_url(url)
+        should_append = (
+            item.append_slash
+            if item.append_slash is not None
+            else settings.APPEND_SLASH
+        )
+        path = parsed_url.path
+        if should_append:
+            path = path.rstrip("/") + "/"
+        attrs["data-nav-match"] = "exact" if item.match == "view" else item.match
+        attrs["data-nav-path"] = path
+        if should_append:
+            attrs["data-nav-append-slash"] = "true"
+        if parsed_url.scheme:
+            attrs["data-nav-scheme"] = parsed_url.scheme
+        if parsed_url.netloc:
+            attrs["data-nav-host"] = parsed_url.netloc
+        if isinstance(policy, str):
+            attrs["data-nav-query-mode"] = policy
+        else:
+            attrs["data-nav-query-mode"] = "keys"
+            attrs["data-nav-query-keys"] = " ".join(policy)
+        if policy != "ignore" and url_query:
+            attrs["data-nav-query"] = urlencode([
+                (key, value) for key, values in url_query for value in values
+            ])
+
+    if item.active_patterns:
+        attrs["data-nav-patterns"] = json.dumps(item.active_patterns)
+
+    return flatatt(attrs)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import linecache
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from django.http import HttpRequest
+
+from ._native import render_navitem
+
+if TYPE_CHECKING:
+    from ._plan import NavPlan
+    from ._plan import URLTable
+    from .nav import NavGroup
+    from .nav import NavItem
+    from .nav import NavItemContext
+
+BuildFunction = Callable[
+    [HttpRequest, list[bool], set[int], dict[int, str]], "list[NavItemContext]"
+]
+
+NAVITEM_TEMPLATE = "django_simple_nav/navitem.html"
+
+
+def generate_build(plan: NavPlan, table: URLTable) -> BuildFunction:
+    """Generate a build function specialized to `plan`'s tree and `table`'s URLs.
+
+    The function does what `NavPlan.build()` does for server-side matching,
+    unrolled into straight-line code: one block per node, with its title,
+    URL and extra context bound as constants and its children's contexts
+    collected by name. The built-in item template's output for a static
+    `NavItem` is rendered up front, once per active state.
+    """
+    from .nav import NavItemContext
+
+    namespace: dict[str, object] = {"NavItemContext": NavItemContext}
+    lines = [
+        "def build(request, reachable, active_nodes, dynamic_urls):",
+    ]
+
+    # children come after their parent, so emitting the nodes backwards
+    # defines every child's context before the group that contains it
+    for idx in range(len(plan.nodes) - 1, -1, -1):
+        node = plan.nodes[idx]
+        url = table.urls[idx]
+        namespace[f"N{idx}"] = node
+        namespace[f"T{idx}"] = plan.titles[idx]
+
+        lines.append(f"    c{idx} = None")
+        lines.append(f"    if reachable[{idx}]:")
+        if idx in table.dynamic_nodes:
+            url_expr = f"dynamic_urls[{idx}]"
+        else:
+            namespace[f"U{idx}"] = url
+            url_expr = f"U{idx}"
+        if plan.is_group[idx]:
+            items_expr = _collect(range(plan.child_start[idx], plan.child_end[idx]))
+        else:
+            items_expr = "None"
+        extra_context = plan.extra_context[idx]
+        extra = ""
+        if extra_context:
+            namespace[f"E{idx}"] = extra_context
+            extra = f", **E{idx}"
+
+        lines.append(f"        a{idx} = {idx} in active_nodes")
+        prerendered = "None"
+        if not plan.is_group[idx] and isinstance(url, str):
+            html = _prerender(node, plan.titles[idx], url, extra_context)
+            if html is not None:
+                namespace[f"H{idx}"] = html
+                prerendered = f"H{idx}[a{idx}]"
+        lines.append(
+            f"        c{idx} = NavItemContext("
+            f'{{"title": T{idx}, "url": {url_expr}, "active": a{idx}, '
+            f'"items": {items_expr}{extra}}}, '
+            f"nav_item=N{idx}, request=request, prerendered={prerendered})"
+        )
+
+    lines.append(f"    return {_collect(range(plan.num_roots))}")
+    source = "\n".join(lines) + "\n"
+
+    filename = f"<django_simple_nav build {plan.definition_hash[:8]}>"
+    # keeps the generated source in tracebacks
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    exec(compile(source, filename, "exec"), namespace)  # noqa: S102
+    return namespace["build"]  # type: ignore[return-value]
+
+
+def _collect(indexes: range) -> str:
+    # the contexts of the reachable nodes among `indexes`, in order
+    if not indexes:
+        return "[]"
+    names = "".join(f"c{idx}, " for idx in indexes)
+    return f"[c for c in ({names}) if c is not None]"
+
+
+def _prerender(
+    node: NavGroup | NavItem,
+    title: object,
+    url: str,
+    extra_context: dict[str, object],
+) -> tuple[str, str] | None:
+    from .nav import NavItem
+
+    # only a node that keeps the default template, whose output doesn't
+    # depend on anything but the context built here
+    if type(node).get_template_name is not NavItem.get_template_name:
+        return None
+    if node.get_template_name() != NAVITEM_TEMPLATE:
+        return None
+    context = {"title": title, "url": url, "items": None, **extra_context}
+    inactive = render_navitem({**context, "active": False})
+    active = render_navitem({**context, "active": True})
+    if inactive is None or active is None:
+        return None
+    return inactive, active
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import itertools
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+from typing import TypeVar
+
+from django.http import HttpRequest
+from django.utils.safestring import SafeString
+
+from ._client import match_attrs
+from ._request import QueryPolicy
+
+if TYPE_CHECKING:
+    from .nav import NavGroup
+    from .nav import NavItem
+
+T = TypeVar("T")
+
+_current_evaluator: ContextVar[NavEvaluator | None] = ContextVar(
+    "django_simple_nav_evaluator", default=None
+)
+
+
+class NavEvaluator:
+    """Memoizes the per-node results of evaluating a nav tree for one request.
+
+    Every lookup still goes through the node's public override point
+    (`get_url()`, `get_active()`, `check_permissions()`, `get_items()` and
+    `get_context_data()`), but each one is called at most once per node for
+    the lifetime of the evaluator. `NavGroup` recursion is routed back through
+    the evaluator, so walking a tree of N nodes costs O(N) method calls.
+
+    `match_query` is the query matching policy of the `Nav` being evaluated,
+    used by items that don't set their own. When `client_prefix` is set, the
+    nav is rendered for `active.js`: `get_active()` is skipped and every item
+    gets `match_attrs`, with node ids starting with the prefix.
+    """
+
+    def __init__(
+        self,
+        request: HttpRequest,
+        match_query: QueryPolicy = "exact",
+        client_prefix: str | None = None,
+    ) -> None:
+        self.request = request
+        self.match_query = match_query
+        self.client_prefix = client_prefix
+        # keyed by `id()` since the dataclasses hold lists and are unhashable,
+        # the node itself is stored alongside the value to keep its id stable
+        self._memo: dict[tuple[str, int], tuple[object, object]] = {}
+        # the group each item was listed by, recorded as `get_items()` runs
+        self._parents: dict[int, NavGroup | NavItem] = {}
+        self._node_count = itertools.count()
+
+    def _memoize(self, name: str, item: object, compute: Callable[[], T]) -> T:
+        key = (name, id(item))
+        if (cached := self._memo.get(key)) is not None:
+            return cached[1]  # type: ignore[return-value]
+        value = compute()
+        self._memo[key] = (item, value)
+        return value
+
+    def get_url(self, item: NavGroup | NavItem) -> str:
+        return self._memoize("url", item, item.get_url)
+
+    def get_active(self, item: NavGroup | NavItem) -> bool:
+        if self.client_prefix is not None:
+            return False
+        return self._memoize("active", item, lambda: item.get_active(self.request))
+
+    def check_permissions(self, item: NavGroup | NavItem) -> bool:
+        return self._memoize(
+            "permissions", item, lambda: item.check_permissions(self.request)
+        )
+
+    def get_items(self, item: NavGroup | NavItem) -> list[NavGroup | NavItem] | None:
+        def get_items() -> list[NavGroup | NavItem] | None:
+            items = item.get_items(self.request)
+            for child in items or ():
+                self._parents[id(child)] = item
+            return items
+
+        return self._memoize("items", item, get_items)
+
+    def get_node_id(self, item: NavGroup | NavItem) -> str:
+        return self._memoize(
+            "node_id", item, lambda: f"{self.client_prefix}-{next(self._node_count)}"
+        )
+
+    def get_match_attrs(self, item: NavGroup | NavItem) -> SafeString:
+        def get_match_attrs() -> SafeString:
+            parent = self._parents.get(id(item))
+            policy = (
+                item._query_policy
+                if item._query_policy is not None
+                else self.match_query
+            )
+            return match_attrs(
+                item,
+                self.get_url(item),
+                policy,
+                self.get_node_id(item),
+                None if parent is None else self.get_node_id(parent),
+            )
+
+        return self._memoize("match_attrs", item, get_match_attrs)
+
+    def get_context_data(self, item: NavGroup | NavItem) -> dict[str, object]:
+        return self._memoize(
+            "context", item, lambda: item.get_context_data(self.request)
+        )
+
+
+def get_current_evaluator() -> NavEvaluator | None:
+    return _current_evaluator.get()
+
+
+@contextmanager
+def evaluation(
+    request: HttpRequest,
+    match_query: QueryPolicy | None = None,
+    client_prefix: str | None = None,
+) -> Iterator[NavEvaluator]:
+    """Reuse the active evaluator for `request`, or start a new one.
+
+    Passing `match_query` or `client_prefix` only reuses an evaluator with the
+    same value, since its memoized active states depend on them.
+
+    The evaluator is stored in a `ContextVar`, so concurrent renders in other
+    threads or asyncio tasks never share memoized results.
+    """
+    evaluator = _current_evaluator.get()
+    if (
+        evaluator is not None
+        and evaluator.request is request
+        and match_query in (None, evaluator.match_query)
+        and client_prefix in (None, evaluator.client_prefix)
+    ):
+        yield evaluator
+        return
+
+    evaluator = NavEvaluator(request, match_query or "exact", client_prefix)
+    token = _current_evaluator.set(evaluator)
+    try:
+        yield evaluator
+    finally:
+        _current_evaluator.reset(token)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django_simple_nav.conf import app_settings
+
+
+class LocalCache:
+    """A bounded, thread-safe LRU of cache entries, local to one process.
+
+    Entries expire after their own timeout, and the least recently used
+    entries are evicted once there are more than `max_entries` of them or
+    their estimated size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        # key -> (expires at, size, value), least recently used first
+        self._entries: OrderedDict[str, tuple[float, int, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> object | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: str, value: object, timeout: float) -> None:
+        size = _sizeof(value)
+        if timeout <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + timeout, size, value)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.size,
+            }
+
+    def _remove(self, key: str) -> None:
+        self.size -= self._entries.pop(key)[1]
+
+
+_local_caches: dict[str, LocalCache] = {}
+
+
+def get_local_cache(alias: str) -> LocalCache | None:
+    """Return the local cache in front of the `alias` cache, `None` if disabled."""
+    max_entries = app_settings.LOCAL_CACHE_MAX_ENTRIES
+    if max_entries <= 0:
+        return None
+    max_bytes = app_settings.LOCAL_CACHE_MAX_BYTES
+    local = _local_caches.get(alias)
+    if local is None or (local.max_entries, local.max_bytes) != (
+        max_entries,
+        max_bytes,
+    ):
+        local = _local_caches[alias] = LocalCache(max_entries, max_bytes)
+    return local
+
+
+def _sizeof(value: object) -> int:
+    # an estimate: cached values are HTML strings and tuples of them
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(_sizeof(item) for item in value)
+    return size
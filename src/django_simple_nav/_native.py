@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Callable
+from collections.abc import Mapping
+
+from django.http import HttpRequest
+from django.template.backends.base import BaseEngine
+from django.template.backends.django import DjangoTemplates
+from django.utils.html import conditional_escape
+
+from ._templates import get_engine_template
+from ._templates import get_request_context
+
+# the variables the built-in templates read, which a context processor must
+# not shadow for the output to stay the same
+TEMPLATE_VARIABLES = frozenset({"url", "title", "active", "items", "match_attrs"})
+
+NativeRenderer = Callable[[Mapping[str, object]], "str | None"]
+
+
+def render_navitem(context: Mapping[str, object]) -> str | None:
+    """Render `django_simple_nav/navitem.html`, `None` if it can't be."""
+    if (link := _render_link(context)) is None:
+        return None
+    return f"{link}\n"
+
+
+def render_navgroup(context: Mapping[str, object]) -> str | None:
+    """Render `django_simple_nav/navgroup.html`, `None` if it can't be."""
+    if (link := _render_link(context)) is None:
+        return None
+    items = context.get("items")
+    if items is not None and not isinstance(items, list):
+        return None
+    if not items:
+        return f"{link}\n\n"
+    children = "".join([f"<li>{conditional_escape(str(item))}</li>" for item in items])
+    return f"{link}\n\n  <ul>\n    {children}\n  </ul>\n\n"
+
+
+def _render_link(context: Mapping[str, object]) -> str | None:
+    # the `{% if url %}` block, including the line breaks around it
+    url = context.get("url")
+    title = context.get("title")
+    match_attrs = context.get("match_attrs") or ""
+    if not (
+        isinstance(url, str) and isinstance(title, str) and isinstance(match_attrs, str)
+    ):
+        # anything else may be localized or called by the template engine
+        return None
+    title = conditional_escape(title)
+    match_attrs = conditional_escape(match_attrs)
+    if url:
+        current = ' aria-current="page"' if context.get("active") else ""
+        return f'\n  <a href="{conditional_escape(url)}"{match_attrs}{current}>{title}</a>\n'
+    return f"\n  <span{match_attrs}>{title}</span>\n"
+
+
+NATIVE_RENDERERS: dict[str, NativeRenderer] = {
+    "django_simple_nav/navitem.html": render_navitem,
+    "django_simple_nav/navgroup.html": render_navgroup,
+}
+
+# where the app directories loader finds the package's own templates
+BUILTIN_ORIGINS = {
+    template_name: os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "templates", template_name)
+    )
+    for template_name in NATIVE_RENDERERS
+}
+
+
+def get_native_renderer(
+    engine: BaseEngine, template_name: str, request: HttpRequest
+) -> NativeRenderer | None:
+    """Return the native renderer for one of the built-in item templates.
+
+    Only when the engine would load the package's own file, autoescapes, and
+    no context processor shadows one of the template's variables. Otherwise `None`, and the template is rendered as usual.
+    """
+    renderer = NATIVE_RENDERERS.get(template_name)
+    if renderer is None or not isinstance(engine, DjangoTemplates):
+        return None
+    if not engine.engine.autoescape:
+        return None
+
+    # a project template with the same name comes first in the loaders
+    origin = get_engine_template(engine, template_name).origin  # type: ignore[attr-defined]
+    if origin.name != BUILTIN_ORIGINS[template_name]:
+        return None
+
+    request_context = get_request_context(engine, request)
+    if request_context is None or TEMPLATE_VARIABLES & request_context.keys():
+        return None
+    return renderer
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import cast
+
+from django.contrib.auth import get_backends
+from django.contrib.auth.models import AbstractUser
+from django.http import HttpRequest
+
+from django_simple_nav.conf import app_settings
+
+PERMISSIONS_ATTRIBUTE = "_django_simple_nav_permissions"
+
+
+def get_user_permissions(request: HttpRequest) -> frozenset[str] | None:
+    """Return every permission `request.user` has, fetched once per request.
+
+    One `get_all_permissions()` call replaces a `has_perm()` call per
+    permission string, each of which goes through every auth backend. Returns
+    `None` when permissions must be checked one at a time with `has_perm()`:
+    when `DJANGO_SIMPLE_NAV['BATCH_PERMISSIONS']` isn't `True`, or when an auth
+    backend's `has_perm()` may decide more than its `get_all_permissions()`
+    reports. A `PermissionDenied` raised by `has_perm()` to veto a permission
+    can't be detected, so batching bypasses such vetoes.
+    """
+    user = cast(AbstractUser, request.user)
+    cached = getattr(request, PERMISSIONS_ATTRIBUTE, None)
+    if cached is not None and cached[0] is user:
+        return cast("frozenset[str] | None", cached[1])
+
+    permissions: frozenset[str] | None = None
+    if app_settings.BATCH_PERMISSIONS and all(
+        _reports_all_permissions(backend) for backend in get_backends()
+    ):
+        permissions = frozenset(user.get_all_permissions())
+    setattr(request, PERMISSIONS_ATTRIBUTE, (user, permissions))
+    return permissions
+
+
+def _reports_all_permissions(backend: object) -> bool:
+    # `has_perm()` may grant or veto (by raising `PermissionDenied`) beyond
+    # what `get_all_permissions()` reports when it's defined by a subclass of
+    # the class that defines `get_all_permissions()`, or when it's missing,
+    # as Django then skips the backend in `has_perm()` but not in
+    # `get_all_permissions()`
+    mro = type(backend).__mro__
+    has_perm_owner = _defining_class(mro, "has_perm")
+    get_all_permissions_owner = _defining_class(mro, "get_all_permissions")
+    if has_perm_owner is None or get_all_permissions_owner is None:
+        return False
+    return mro.index(has_perm_owner) >= mro.index(get_all_permissions_owner)
+
+
+def _defining_class(mro: tuple[type, ...], name: str) -> type | None:
+    return next((cls for cls in mro if name in vars(cls)), None)
+
+
+def user_has_perm(request: HttpRequest, perm: str) -> bool:
+    permissions = get_user_permissions(request)
+    if permissions is None:
+        return cast(AbstractUser, request.user).has_perm(perm)
+    return perm in permissions
@@ -0,0 +1,987 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+from array import array
+from collections.abc import Callable
+from collections.abc import Hashable
+from collections.abc import Iterator
+from dataclasses import fields
+from typing import TYPE_CHECKING
+from typing import TypeVar
+from typing import cast
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest
+from django.urls import get_script_prefix
+from django.utils import translation
+from django.utils.functional import Promise
+from django.utils.translation import get_language
+
+from django_simple_nav import __version__
+
+from ._client import match_attrs
+from ._codegen import BuildFunction
+from ._codegen import generate_build
+from ._permissions import user_has_perm
+from ._request import ParsedRequest
+from ._request import QueryKey
+from ._request import QueryPolicy
+from ._request import parse_request
+from ._request import path_segments
+from ._request import query_matches
+from ._request import query_policy
+from ._urls import URLKind
+from ._urls import URLPartition
+from ._urls import get_partition
+from ._urls import split_url
+
+if TYPE_CHECKING:
+    from .nav import Nav
+    from .nav import NavGroup
+    from .nav import NavItem
+    from .nav import NavItemContext
+
+logger = logging.getLogger(__name__)
+
+PLAN_ATTRIBUTE = "_django_simple_nav_plan"
+
+# methods whose base implementations the plan reproduces; a node whose class
+# overrides any of them is evaluated through the regular method calls instead
+NODE_METHODS = (
+    "get_context_data",
+    "get_title",
+    "get_url",
+    "get_active",
+    "get_items",
+    "check_permissions",
+)
+
+# filtered trees kept per plan, one per distinct permission fingerprint
+FILTER_CACHE_SIZE = 256
+_cache_lock = threading.Lock()
+
+# markers stored in place of a resolved URL
+DYNAMIC_URL = object()
+MISSING_URL = object()
+
+# (scheme, netloc, append slash, path, query)
+ActiveTarget = tuple[str, str, bool, str, QueryKey]
+# an `ActiveTarget` indexed without its query, which is checked separately
+PathTarget = tuple[str, str, bool, str, None]
+# (plan index, scheme, netloc, longest prefix wins)
+PrefixEntry = tuple[int, str, str, bool]
+PermissionCallable = Callable[[HttpRequest], bool]
+
+T = TypeVar("T")
+
+
+class PathTrie:
+    """Prefix-matched nodes keyed by their URL's path segments.
+
+    Walking a request path visits one trie node per path segment, so finding
+    every prefix match costs O(path segments) regardless of the nav's size.
+    """
+
+    __slots__ = ("root",)
+
+    def __init__(self) -> None:
+        self.root: tuple[dict[str, object], list[PrefixEntry]] = ({}, [])
+
+    def insert(self, segments: tuple[str, ...], entry: PrefixEntry) -> None:
+        node = self.root
+        for segment in segments:
+            node = node[0].setdefault(segment, ({}, []))  # type: ignore[assignment]
+        node[1].append(entry)
+
+    def walk(self, segments: tuple[str, ...]) -> Iterator[tuple[int, PrefixEntry]]:
+        """Yield `(depth, entry)` for every entry along `segments`."""
+        node = self.root
+        for entry in node[1]:
+            yield 0, entry
+        for depth, segment in enumerate(segments, 1):
+            node = node[0].get(segment)  # type: ignore[assignment]
+            if node is None:
+                return
+            for entry in node[1]:
+                yield depth, entry
+
+
+class PatternMatcher:
+    """Every node's `active_patterns` combined into a single regex.
+
+    Each pattern becomes an optional lookahead with its own named group, so
+    one `match()` call reports every pattern that `re.search()` would find in
+    the path. Patterns that can't be safely combined (capturing groups, which
+    would renumber backreferences, or global inline flags) are searched
+    individually.
+    """
+
+    __slots__ = ("combined", "group_nodes", "separate")
+
+    def __init__(self, patterns: list[tuple[re.Pattern[str], ...]]) -> None:
+        branches: list[str] = []
+        self.group_nodes: dict[str, int] = {}
+        self.separate: list[tuple[int, re.Pattern[str]]] = []
+        for idx, regexes in enumerate(patterns):
+            for regex in regexes:
+                if regex.groups or regex.flags != re.UNICODE:
+                    self.separate.append((idx, regex))
+                    continue
+                name = f"n{len(branches)}"
+                self.group_nodes[name] = idx
+                branches.append(rf"(?:(?=[\s\S]*?(?P<{name}>{regex.pattern}))|)")
+
+        self.combined: re.Pattern[str] | None = None
+        if branches:
+            try:
+                self.combined = re.compile("".join(branches))
+            except re.error:
+                self.separate = [
+                    (idx, regex)
+                    for idx, regexes in enumerate(patterns)
+                    for regex in regexes
+                ]
+                self.group_nodes = {}
+
+    def __bool__(self) -> bool:
+        return self.combined is not None or bool(self.separate)
+
+    def match(self, path: str) -> list[int]:
+        matches: list[int] = []
+        if self.combined is not None:
+            # every branch is optional, so this always matches
+            groups = cast(re.Match[str], self.combined.match(path)).groupdict()
+            matches.extend(
+                self.group_nodes[name]
+                for name, value in groups.items()
+                if value is not None
+            )
+        matches.extend(idx for idx, regex in self.separate if regex.search(path))
+        return matches
+
+
+class URLTable:
+    """The resolved URLs of a plan's nodes for one urlconf/script prefix.
+
+    `active_index` maps the active-match target of every static, exactly
+    matched URL to the nodes that have it, so those nodes are found with one
+    dictionary lookup per distinct target shape instead of comparing the
+    request against each node. Nodes whose query isn't matched exactly are
+    indexed by path alone and their queries checked against `query_checks`.
+    Prefix-matched URLs live in `prefix_trie`, and
+    nodes matched by view name keep their targets in `view_targets` for
+    requests that were never resolved.
+
+    A table is only valid while its `URLPartition` is the current one, which
+    ties it to the same invalidation as the `resolve_url()` cache.
+    """
+
+    __slots__ = (
+        "partition",
+        "urls",
+        "target_nodes",
+        "dynamic_nodes",
+        "active_index",
+        "query_checks",
+        "shapes",
+        "prefix_trie",
+        "view_targets",
+        "match_attrs",
+        "build_function",
+    )
+
+    def __init__(
+        self,
+        partition: URLPartition,
+        urls: list[object],
+        targets: list[ActiveTarget | None],
+        match: list[str],
+        query_policies: list[QueryPolicy],
+    ) -> None:
+        self.partition = partition
+        self.urls = urls
+        self.target_nodes = [idx for idx, target in enumerate(targets) if target]
+        self.dynamic_nodes = [
+            idx
+            for idx, url in enumerate(urls)
+            if url is DYNAMIC_URL or url is MISSING_URL
+        ]
+        self.active_index: dict[ActiveTarget | PathTarget, list[int]] = {}
+        self.query_checks: dict[int, tuple[QueryPolicy, QueryKey]] = {}
+        self.prefix_trie = PathTrie()
+        self.view_targets: list[tuple[int, ActiveTarget]] = []
+        # filled in by the first client-side render, see `NavPlan.get_match_attrs()`
+        self.match_attrs: list[str] | None = None
+        # generated by the first render of a nav with `codegen`, see
+        # `generate_build()`
+        self.build_function: BuildFunction | None = None
+        # which of scheme/netloc/append slash/query the indexed targets use
+        shapes: set[tuple[bool, bool, bool, bool]] = set()
+        for idx in self.target_nodes:
+            target = cast(ActiveTarget, targets[idx])
+            if match[idx] == "view":
+                self.view_targets.append((idx, target))
+            elif match[idx] == "exact":
+                policy = query_policies[idx]
+                key: ActiveTarget | PathTarget = target
+                if policy != "exact":
+                    key = (*target[:4], None)
+                    self.query_checks[idx] = (policy, target[4])
+                self.active_index.setdefault(key, []).append(idx)
+                shapes.add((
+                    bool(target[0]),
+                    bool(target[1]),
+                    target[2],
+                    policy == "exact",
+                ))
+            else:
+                self.prefix_trie.insert(
+                    path_segments(target[3]),
+                    (idx, target[0], target[1], match[idx] == "longest_prefix"),
+                )
+        self.shapes = sorted(shapes)
+
+    def lookup(self, parsed_request: ParsedRequest) -> list[int]:
+        matches: list[int] = []
+        for has_scheme, has_netloc, append_slash, has_query in self.shapes:
+            scheme = parsed_request.scheme if has_scheme else ""
+            netloc = parsed_request.netloc if has_netloc else ""
+            path = parsed_request.path_slash if append_slash else parsed_request.path
+            key: ActiveTarget | PathTarget
+            if has_query:
+                key = (scheme, netloc, append_slash, path, parsed_request.query_key)
+            else:
+                key = (scheme, netloc, append_slash, path, None)
+            matches.extend(self.active_index.get(key, ()))
+        if self.query_checks:
+            matches = [
+                idx
+                for idx in matches
+                if idx not in self.query_checks
+                or query_matches(*self.query_checks[idx], parsed_request.query_key)
+            ]
+        return matches
+
+    def lookup_prefix(
+        self, parsed_request: ParsedRequest
+    ) -> Iterator[tuple[int, int, bool]]:
+        """Yield `(depth, plan index, longest prefix wins)` for prefix matches."""
+        for depth, (idx, scheme, netloc, longest) in self.prefix_trie.walk(
+            parsed_request.segments
+        ):
+            if (not scheme or scheme == parsed_request.scheme) and (
+                not netloc or netloc == parsed_request.netloc
+            ):
+                yield depth, idx, longest
+
+
+class NavPlan:
+    """A `Nav.items` tree flattened into parallel, breadth-first arrays.
+
+    Node `i`'s children occupy `child_start[i]:child_end[i]`, and the
+    top-level items are `0:num_roots`, so a parent always precedes its
+    children. A single reverse pass therefore resolves permissions bottom-up
+    and a single forward pass resolves which nodes are reachable.
+    """
+
+    def __init__(
+        self, nav_items: list[NavGroup | NavItem], match_query: QueryPolicy = "exact"
+    ) -> None:
+        from .nav import NavGroup
+
+        self.nodes: list[NavGroup | NavItem] = list(nav_items)
+        self.num_roots = len(self.nodes)
+        self.parent = array("i", [-1] * self.num_roots)
+        self.depth = array("i", [0] * self.num_roots)
+        self.child_start = array("i")
+        self.child_end = array("i")
+
+        idx = 0
+        while idx < len(self.nodes):
+            node = self.nodes[idx]
+            self.child_start.append(len(self.nodes))
+            if isinstance(node, NavGroup):
+                for child in node.items:
+                    self.nodes.append(child)
+                    self.parent.append(idx)
+                    self.depth.append(self.depth[idx] + 1)
+            self.child_end.append(len(self.nodes))
+            idx += 1
+
+        self.is_group = [isinstance(node, NavGroup) for node in self.nodes]
+        self.has_url = [bool(node.url) for node in self.nodes]
+        self.ancestors: list[tuple[int, ...]] = []
+        for idx in range(len(self.nodes)):
+            parent_idx = self.parent[idx]
+            self.ancestors.append(
+                () if parent_idx < 0 else (parent_idx, *self.ancestors[parent_idx])
+            )
+        self.titles = [node.get_title() for node in self.nodes]
+        self.match = [node.match for node in self.nodes]
+        self.query_policy = [
+            match_query if node._query_policy is None else node._query_policy
+            for node in self.nodes
+        ]
+        self.view_index: dict[str, list[int]] = {}
+        for idx, node in enumerate(self.nodes):
+            if node.match == "view":
+                self.view_index.setdefault(cast(str, node.url), []).append(idx)
+        self.pattern_matcher = PatternMatcher([
+            node._active_regexes for node in self.nodes
+        ])
+        self.has_permissions = [bool(node.permissions) for node in self.nodes]
+        # every distinct permission string gets a bit, so a node's string
+        # permissions compile down to a single integer mask
+        self.permission_bits: dict[str, int] = {}
+        self.required_masks: list[int] = []
+        self.callable_permissions: list[tuple[PermissionCallable, ...]] = []
+        for node in self.nodes:
+            required_mask = 0
+            callables: list[PermissionCallable] = []
+            for perm in node.permissions:
+                if callable(perm):
+                    callables.append(perm)
+                else:
+                    bit = self.permission_bits.setdefault(
+                        perm, 1 << len(self.permission_bits)
+                    )
+                    required_mask |= bit
+            self.required_masks.append(required_mask)
+            self.callable_permissions.append(tuple(callables))
+        self.tiers = self.get_tiers()
+        # identifies the definition across processes and deploys, for keys in
+        # shared caches
+        definition = (
+            __version__,
+            tuple(self.parent),
+            tuple(_describe_node(node) for node in self.nodes),
+        )
+        self.definition_hash = hashlib.sha256(repr(definition).encode()).hexdigest()
+        self.extra_context = [
+            _static_extra_context(node, is_group)
+            for node, is_group in zip(self.nodes, self.is_group, strict=True)
+        ]
+        self._url_tables: dict[tuple[str | None, str, str | None, bool], URLTable] = {}
+        self._relevant_callables: dict[
+            Hashable, tuple[tuple[PermissionCallable, ...], bool]
+        ] = {}
+        self._reachable: dict[Hashable, list[bool]] = {}
+
+    def get_url_table(self) -> URLTable:
+        append_slash = bool(settings.APPEND_SLASH)
+        partition = get_partition()
+        # `reverse()` depends on the language with `i18n_patterns`
+        key = (partition.urlconf, get_script_prefix(), get_language(), append_slash)
+        table = self._url_tables.get(key)
+        if table is not None and table.partition is partition:
+            return table
+
+        urls: list[object] = []
+        targets: list[ActiveTarget | None] = []
+        for node in self.nodes:
+            url: object
+            if node._url_kind is URLKind.CALLABLE:
+                url = DYNAMIC_URL
+            else:
+                try:
+                    url = node.get_url()
+                except ImproperlyConfigured:
+                    url = MISSING_URL
+            urls.append(url)
+            targets.append(
+                _active_target(url, _should_append(node, append_slash))
+                if isinstance(url, str)
+                else None
+            )
+
+        table = URLTable(partition, urls, targets, self.match, self.query_policy)
+        self._url_tables[key] = table
+        return table
+
+    def get_tiers(self) -> dict[str | int, list[bool]]:
+        """Filter the tree up front for users who need no permission lookups.
+
+        Requests without a user and superusers never consult a permission, so
+        their trees are fixed. So is an `AnonymousUser`'s when the plan only
+        references user attribute permissions and none of the items it could
+        see have callable permissions. Plans with only user attribute
+        permissions and no callables add one tree per combination of those
+        attributes, filled in as authenticated users come in.
+        """
+        from .nav import USER_ATTRIBUTE_PERMISSIONS
+
+        self.attribute_only = not any(self.callable_permissions) and all(
+            perm in USER_ATTRIBUTE_PERMISSIONS for perm in self.permission_bits
+        )
+        tiers: dict[str | int, list[bool]] = {
+            "none": self.filter(_tier_check(None)),
+            "superuser": self.filter(_tier_check(-1)),
+        }
+        if all(perm in USER_ATTRIBUTE_PERMISSIONS for perm in self.permission_bits):
+            anonymous_mask = self.get_attribute_mask(AnonymousUser())
+            if not any(
+                self.callable_permissions[idx]
+                and not self.required_masks[idx] & ~anonymous_mask
+                for idx in range(len(self.nodes))
+            ):
+                tiers["anonymous"] = self.filter(_tier_check(anonymous_mask))
+        return tiers
+
+    def get_attribute_mask(self, user: object) -> int:
+        user_mask = 0
+        for perm, bit in self.permission_bits.items():
+            if getattr(user, perm, False):
+                user_mask |= bit
+        return user_mask
+
+    def get_tier(self, request: HttpRequest) -> str | int | None:
+        """Return the request's precomputed tier in `tiers`, if it has one.
+
+        Trees for attribute-only plans are filled in here on first use.
+        """
+        if not apps.is_installed("django.contrib.auth"):
+            return None
+        if not hasattr(request, "user"):
+            return "none"
+        user = request.user
+        if getattr(user, "is_superuser", False):
+            return "superuser"
+        if isinstance(user, AnonymousUser):
+            return "anonymous" if "anonymous" in self.tiers else None
+        if not self.attribute_only:
+            return None
+
+        user_mask = self.get_attribute_mask(user)
+        if user_mask not in self.tiers:
+            self.tiers[user_mask] = self.filter(_tier_check(user_mask))
+        return user_mask
+
+    def get_filter_key(self, permission_check: PermissionCheck) -> Hashable | None:
+        """Return a key shared by every request that sees the same tree.
+
+        Requests that agree on every permission this plan references, and on
+        the callables those leave to decide, share one filtered tree. A
+        callable permission joins the key through its own `cache_key(request)`
+        if it has one, otherwise through its result. A callable with
+        `cacheable = False` makes the key `None` for requests it is consulted
+        on.
+        """
+        base_key = permission_check.key
+        relevant = self._relevant_callables.get(base_key)
+        if relevant is None:
+            callables: dict[int, PermissionCallable] = {}
+            for idx in range(len(self.nodes)):
+                if self.callable_permissions[idx] and permission_check.applies(
+                    self.required_masks[idx]
+                ):
+                    for perm in self.callable_permissions[idx]:
+                        callables.setdefault(id(perm), perm)
+            relevant = (
+                tuple(callables.values()),
+                all(getattr(perm, "cacheable", True) for perm in callables.values()),
+            )
+            _cache_set(self._relevant_callables, base_key, relevant)
+
+        relevant_callables, cacheable = relevant
+        if not cacheable:
+            return None
+        return (
+            base_key,
+            tuple(permission_check.callable_key(perm) for perm in relevant_callables),
+        )
+
+    def get_permission_key(self, request: HttpRequest) -> Hashable | None:
+        """Return a key for the request's filtered tree, `None` if uncacheable."""
+        tier = self.get_tier(request)
+        if tier is not None:
+            return ("tier", tier)
+        return self.get_filter_key(PermissionCheck(request, self.permission_bits))
+
+    def get_reachable(self, request: HttpRequest) -> list[bool]:
+        """Return which nodes the request can see, cached across requests."""
+        tier = self.get_tier(request)
+        if tier is not None:
+            return self.tiers[tier]
+
+        permission_check = PermissionCheck(request, self.permission_bits)
+        key = self.get_filter_key(permission_check)
+        if key is None:
+            return self.filter(permission_check)
+
+        reachable = self._reachable.get(key)
+        if reachable is None:
+            reachable = self.filter(permission_check)
+            _cache_set(self._reachable, key, reachable)
+        return reachable
+
+    def filter(
+        self,
+        permission_check: Callable[[int, tuple[PermissionCallable, ...], bool], bool],
+    ) -> list[bool]:
+        num_nodes = len(self.nodes)
+        child_start = self.child_start
+        child_end = self.child_end
+
+        visible = [False] * num_nodes
+        for idx in range(num_nodes - 1, -1, -1):
+            has_perm = permission_check(
+                self.required_masks[idx],
+                self.callable_permissions[idx],
+                self.has_permissions[idx],
+            )
+            if (
+                self.is_group[idx]
+                and not self.has_url[idx]
+                and not any(visible[child_start[idx] : child_end[idx]])
+            ):
+                has_perm = False
+            visible[idx] = has_perm
+
+        parent = self.parent
+        reachable = visible
+        for idx in range(self.num_roots, num_nodes):
+            if reachable[idx] and not reachable[parent[idx]]:
+                reachable[idx] = False
+        return reachable
+
+    def evaluate(
+        self, request: HttpRequest, client: bool = False, codegen: bool = False
+    ) -> list[NavItemContext]:
+        reachable = self.get_reachable(request)
+        table = self.get_url_table()
+        dynamic_urls = self.get_dynamic_urls(table, reachable)
+        if client:
+            # `active.js` marks the active nodes in the browser instead
+            match_attrs = self.get_match_attrs(table, dynamic_urls)
+            return self.build(
+                request, table, dynamic_urls, reachable, set(), match_attrs
+            )
+        active_nodes = self.get_active_nodes(request, table, dynamic_urls, reachable)
+        if codegen:
+            if table.build_function is None:
+                table.build_function = generate_build(self, table)
+            return table.build_function(request, reachable, active_nodes, dynamic_urls)
+        return self.build(request, table, dynamic_urls, reachable, active_nodes)
+
+    def get_match_attrs(
+        self, table: URLTable, dynamic_urls: dict[int, str]
+    ) -> list[str]:
+        """Return the `active.js` data attributes of every node."""
+        if table.match_attrs is None:
+            table.match_attrs = [
+                self._match_attrs(idx, url if isinstance(url, str) else "")
+                for idx, url in enumerate(table.urls)
+            ]
+        if not dynamic_urls:
+            return table.match_attrs
+        attrs = list(table.match_attrs)
+        for idx, url in dynamic_urls.items():
+            attrs[idx] = self._match_attrs(idx, url)
+        return attrs
+
+    def _match_attrs(self, idx: int, url: str) -> str:
+        prefix = self.definition_hash[:8]
+        parent_idx = self.parent[idx]
+        return match_attrs(
+            self.nodes[idx],
+            url,
+            self.query_policy[idx],
+            f"{prefix}-{idx}",
+            None if parent_idx < 0 else f"{prefix}-{parent_idx}",
+        )
+
+    def get_dynamic_urls(
+        self, table: URLTable, reachable: list[bool]
+    ) -> dict[int, str]:
+        dynamic_urls: dict[int, str] = {}
+        for idx in table.dynamic_nodes:
+            if reachable[idx]:
+                # resolved on every request, or raises `ImproperlyConfigured`
+                dynamic_urls[idx] = self.nodes[idx].get_url()
+        return dynamic_urls
+
+    def get_active_nodes(
+        self,
+        request: HttpRequest,
+        table: URLTable,
+        dynamic_urls: dict[int, str],
+        reachable: list[bool],
+    ) -> set[int]:
+        active_nodes: set[int] = set()
+        if (
+            dynamic_urls
+            or self.pattern_matcher
+            or any(reachable[idx] for idx in table.target_nodes)
+        ):
+            for idx in self.find_active(request, table, dynamic_urls, reachable):
+                # every group above a reachable node is visible, so they are
+                # all active too
+                active_nodes.add(idx)
+                active_nodes.update(self.ancestors[idx])
+        return active_nodes
+
+    def build(
+        self,
+        request: HttpRequest,
+        table: URLTable,
+        dynamic_urls: dict[int, str],
+        reachable: list[bool],
+        active_nodes: set[int],
+        match_attrs: list[str] | None = None,
+    ) -> list[NavItemContext]:
+        """Build the context of every reachable node, in a single reverse pass."""
+        from .nav import NavItemContext
+
+        num_nodes = len(self.nodes)
+        child_start = self.child_start
+        child_end = self.child_end
+        urls = table.urls
+        contexts: list[NavItemContext | None] = [None] * num_nodes
+
+        # children come after their parent, so walking backwards builds every
+        # child's context before the group that contains it
+        for idx in range(num_nodes - 1, -1, -1):
+            if not reachable[idx]:
+                continue
+
+            node = self.nodes[idx]
+            url = dynamic_urls[idx] if idx in dynamic_urls else urls[idx]
+
+            children: list[NavItemContext] | None = None
+            if self.is_group[idx]:
+                children = [
+                    cast("NavItemContext", contexts[child])
+                    for child in range(child_start[idx], child_end[idx])
+                    if reachable[child]
+                ]
+
+            context: dict[str, object] = {
+                "title": self.titles[idx],
+                "url": url,
+                "active": idx in active_nodes,
+                "items": children,
+                **self.extra_context[idx],
+            }
+            if match_attrs is not None:
+                context["match_attrs"] = match_attrs[idx]
+            contexts[idx] = NavItemContext(context, nav_item=node, request=request)
+
+        return [
+            cast("NavItemContext", contexts[idx])
+            for idx in range(self.num_roots)
+            if reachable[idx]
+        ]
+
+    def find_active(
+        self,
+        request: HttpRequest,
+        table: URLTable,
+        dynamic_urls: dict[int, str],
+        reachable: list[bool],
+    ) -> list[int]:
+        """Return the reachable nodes whose own URL matches the request."""
+        parsed_request = parse_request(request)
+        matches = table.lookup(parsed_request)
+        matches.extend(self.pattern_matcher.match(parsed_request.path))
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is not None:
+            matches.extend(self.view_index.get(resolver_match.view_name, ()))
+        else:
+            # not resolved (e.g. rendered outside of a view), so compare URLs
+            matches.extend(
+                idx
+                for idx, target in table.view_targets
+                if _matches(target, parsed_request, self.query_policy[idx])
+            )
+        longest: list[tuple[int, int]] = []
+        for depth, idx, is_longest in table.lookup_prefix(parsed_request):
+            if not reachable[idx]:
+                continue
+            if is_longest:
+                longest.append((depth, idx))
+            else:
+                matches.append(idx)
+
+        append_slash = bool(settings.APPEND_SLASH)
+        for idx, url in dynamic_urls.items():
+            node = self.nodes[idx]
+            target = _active_target(url, _should_append(node, append_slash))
+            if target is None:
+                continue
+            if self.match[idx] == "exact":
+                if _matches(target, parsed_request, self.query_policy[idx]):
+                    matches.append(idx)
+            elif (prefix_depth := _prefix_depth(target, parsed_request)) is not None:
+                if self.match[idx] == "longest_prefix":
+                    longest.append((prefix_depth, idx))
+                else:
+                    matches.append(idx)
+
+        matches = [idx for idx in matches if reachable[idx]]
+        # longest-prefix-wins nodes compete across the whole nav, and only the
+        # deepest reachable ones are active
+        if longest:
+            deepest = max(depth for depth, _ in longest)
+            matches.extend(idx for depth, idx in longest if depth == deepest)
+        return matches
+
+
+class PermissionCheck:
+    """`NavItem.check_permissions()` for one request, as a bitwise AND per node.
+
+    The plan gives every distinct permission string a bit and compiles each
+    node's string permissions into a mask. The user's capabilities become a
+    single mask per request, so a node's string permissions pass when none of
+    its bits are missing from it. Superusers short-circuit to an all-ones mask.
+
+    Callable permissions are called at most once per request.
+    """
+
+    def __init__(self, request: HttpRequest, permission_bits: dict[str, int]) -> None:
+        self.request = request
+        self.auth_installed = apps.is_installed("django.contrib.auth")
+        self.has_user = hasattr(request, "user")
+        self.is_superuser = self.has_user and getattr(
+            request.user, "is_superuser", False
+        )
+        self.user_mask = -1
+        if not self.auth_installed:
+            logger.warning(
+                "The 'django.contrib.auth' app is not installed, so permissions will not be checked."
+            )
+        elif self.has_user and not self.is_superuser:
+            self.user_mask = self.get_user_mask(permission_bits)
+        # everything that decides a node's string permissions, projected onto
+        # the permissions the plan references
+        self.key = (
+            self.auth_installed,
+            self.has_user,
+            bool(self.is_superuser),
+            self.user_mask,
+        )
+        self._results: dict[int, bool] = {}
+
+    def get_user_mask(self, permission_bits: dict[str, int]) -> int:
+        from .nav import USER_ATTRIBUTE_PERMISSIONS
+
+        user = cast(AbstractUser, self.request.user)
+        user_mask = 0
+        for perm, bit in permission_bits.items():
+            if perm in USER_ATTRIBUTE_PERMISSIONS:
+                has_perm = getattr(user, perm, False)
+            else:
+                has_perm = user_has_perm(self.request, perm)
+            if has_perm:
+                user_mask |= bit
+        return user_mask
+
+    def applies(self, required_mask: int) -> bool:
+        """Whether a node's callables are consulted once its mask is known."""
+        return (
+            self.auth_installed
+            and self.has_user
+            and not self.is_superuser
+            and not required_mask & ~self.user_mask
+        )
+
+    def check_callable(self, perm: PermissionCallable) -> bool:
+        result = self._results.get(id(perm))
+        if result is None:
+            result = self._results[id(perm)] = bool(perm(self.request))
+        return result
+
+    def callable_key(self, perm: PermissionCallable) -> Hashable:
+        cache_key = getattr(perm, "cache_key", None)
+        if cache_key is not None:
+            return cache_key(self.request)
+        return self.check_callable(perm)
+
+    def __call__(
+        self,
+        required_mask: int,
+        callables: tuple[PermissionCallable, ...],
+        has_permissions: bool,
+    ) -> bool:
+        if not self.auth_installed:
+            return True
+
+        if not self.has_user:
+            return not has_permissions
+
+        if required_mask & ~self.user_mask:
+            return False
+
+        return self.is_superuser or all(self.check_callable(perm) for perm in callables)
+
+
+def get_nav_plan(nav: Nav) -> NavPlan | None:
+    """Return the compiled plan for a `Nav` subclass with class-level `items`.
+
+    The plan is compiled on first use and cached on the class. Navs built per
+    request (direct construction, factories), navs overriding `get_items()`
+    and trees containing nodes with overridden evaluation methods return
+    `None` and are evaluated through the regular method calls.
+    """
+    from .nav import Nav
+
+    nav_class = type(nav)
+    items = nav.items
+    if (
+        items is None
+        or items is not nav_class.items
+        or nav.match_query != nav_class.match_query
+    ):
+        return None
+
+    cached = nav_class.__dict__.get(PLAN_ATTRIBUTE)
+    if cached is not None and cached[0] is items:
+        return cast("NavPlan | None", cached[1])
+
+    plan: NavPlan | None = None
+    if nav_class.get_items is Nav.get_items and _is_plannable(items):
+        plan = NavPlan(items, query_policy(nav_class.match_query, nav))
+    setattr(nav_class, PLAN_ATTRIBUTE, (items, plan))
+    return plan
+
+
+def _is_plannable(items: object) -> bool:
+    from .nav import NavGroup
+    from .nav import NavItem
+
+    if not isinstance(items, list):
+        return False
+
+    for item in items:
+        if not isinstance(item, NavItem):
+            return False
+        base = NavGroup if isinstance(item, NavGroup) else NavItem
+        item_class = type(item)
+        if any(
+            getattr(item_class, name) is not getattr(base, name)
+            for name in NODE_METHODS
+        ):
+            return False
+        if isinstance(item, NavGroup) and not _is_plannable(item.items):
+            return False
+
+    return True
+
+
+def _tier_check(
+    user_mask: int | None,
+) -> Callable[[int, tuple[PermissionCallable, ...], bool], bool]:
+    # a `PermissionCheck` for a tier, `None` meaning there is no user. callables
+    # are never consulted, tiers only exist where they can't change the result
+    def check(
+        required_mask: int,
+        callables: tuple[PermissionCallable, ...],
+        has_permissions: bool,
+    ) -> bool:
+        if user_mask is None:
+            return not has_permissions
+        return not required_mask & ~user_mask
+
+    return check
+
+
+def _cache_set(cache: dict[Hashable, T], key: Hashable, value: T) -> None:
+    # evict the oldest entry once full, the dicts stay insertion ordered; the
+    # dicts are shared by every thread rendering the nav
+    with _cache_lock:
+        if len(cache) >= FILTER_CACHE_SIZE:
+            cache.pop(next(iter(cache), None), None)
+        cache[key] = value
+
+
+def _describe_node(node: NavGroup | NavItem) -> object:
+    return (
+        f"{type(node).__module__}.{type(node).__qualname__}",
+        tuple(
+            (field.name, _describe(getattr(node, field.name)))
+            for field in fields(node)
+            if field.name != "items"
+        ),
+    )
+
+
+def _describe(value: object) -> object:
+    # a `repr()`-able description that is stable between processes, unlike
+    # the default `repr()` of functions, objects and sets, or lazy objects
+    # evaluated in the active language
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, Promise):
+        with translation.override(None):
+            return str(value)
+    if callable(value):
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', type(value).__qualname__)}"
+    if isinstance(value, (list, tuple)):
+        return tuple(_describe(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(repr(_describe(item)) for item in value))
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), _describe(item)) for key, item in value.items()))
+    if type(value).__repr__ is object.__repr__:
+        # includes the object's address
+        return f"{type(value).__module__}.{type(value).__qualname__}"
+    return repr(value)
+
+
+def _static_extra_context(
+    node: NavGroup | NavItem, is_group: bool
+) -> dict[str, object]:
+    # mirrors the shadowing in `NavItem.get_context_data()`: `title`, `url` and
+    # `active` are never `None`, `items` only is for a `NavGroup`
+    reserved = {"title", "url", "active"}
+    if is_group:
+        reserved.add("items")
+    return {
+        key: value for key, value in node.extra_context.items() if key not in reserved
+    }
+
+
+def _should_append(node: NavGroup | NavItem, append_slash: bool) -> bool:
+    return node.append_slash if node.append_slash is not None else append_slash
+
+
+def _active_target(url: str, should_append: bool) -> ActiveTarget | None:
+    if not url:
+        return None
+    parsed_url, url_query = split_url(url)
+    path = parsed_url.path
+    if should_append:
+        path = path.rstrip("/") + "/"
+    return (parsed_url.scheme, parsed_url.netloc, should_append, path, url_query)
+
+
+def _prefix_depth(target: ActiveTarget, parsed_request: ParsedRequest) -> int | None:
+    scheme, netloc, _, path, _ = target
+    if (scheme and scheme != parsed_request.scheme) or (
+        netloc and netloc != parsed_request.netloc
+    ):
+        return None
+    segments = path_segments(path)
+    if parsed_request.segments[: len(segments)] != segments:
+        return None
+    return len(segments)
+
+
+def _matches(
+    target: ActiveTarget, parsed_request: ParsedRequest, policy: QueryPolicy
+) -> bool:
+    scheme, netloc, should_append, path, query = target
+    if (scheme and scheme != parsed_request.scheme) or (
+        netloc and netloc != parsed_request.netloc
+    ):
+        return False
+    request_path = parsed_request.path_slash if should_append else parsed_request.path
+    return path == request_path and query_matches(
+        policy, query, parsed_request.query_key
+    )
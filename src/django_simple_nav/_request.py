@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest
+
+REQUEST_ATTRIBUTE = "_django_simple_nav_parsed_request"
+
+# parsed query string as sorted `(key, values)` pairs, so it can be hashed
+QueryKey = tuple[tuple[str, tuple[str, ...]], ...]
+# one of `QUERY_MODES`, or the only keys compared between the query strings
+QueryPolicy = str | tuple[str, ...]
+
+QUERY_MODES = frozenset({"ignore", "exact", "subset"})
+
+
+class ParsedRequest:
+    """The parts of a request's absolute URI that active matching compares.
+
+    `request.build_absolute_uri()` validates the host against `ALLOWED_HOSTS`
+    on every call, so the result is parsed once and stored on the request.
+    Each request object belongs to a single thread or asyncio task, which
+    makes the cached value safe under both WSGI and ASGI.
+    """
+
+    __slots__ = (
+        "source",
+        "scheme",
+        "netloc",
+        "path",
+        "path_slash",
+        "query",
+        "query_params",
+        "query_key",
+        "segments",
+    )
+
+    def __init__(self, request: HttpRequest) -> None:
+        self.source = _source(request)
+        parsed = urlparse(request.build_absolute_uri())
+        self.scheme = parsed.scheme
+        self.netloc = parsed.netloc
+        self.path = parsed.path
+        self.path_slash = parsed.path.rstrip("/") + "/"
+        self.query = parsed.query
+        self.query_params = parse_qs(parsed.query)
+        self.query_key = query_key(self.query_params)
+        self.segments = path_segments(self.path)
+
+
+def parse_request(request: HttpRequest) -> ParsedRequest:
+    """Return the parsed absolute URI of `request`, parsing it at most once.
+
+    The cached value is discarded if the request's path or query string has
+    been changed since it was parsed.
+    """
+    parsed = getattr(request, REQUEST_ATTRIBUTE, None)
+    if parsed is None or parsed.source != _source(request):
+        parsed = ParsedRequest(request)
+        setattr(request, REQUEST_ATTRIBUTE, parsed)
+    return parsed
+
+
+def query_key(query: str | dict[str, list[str]]) -> QueryKey:
+    # `parse_qs()` equality ignores key order but not the order of repeated values
+    params = parse_qs(query) if isinstance(query, str) else query
+    return tuple(sorted((key, tuple(values)) for key, values in params.items()))
+
+
+def query_policy(value: object, owner: object) -> QueryPolicy:
+    """Normalize the `match_query` value of `owner`, raising if it is invalid."""
+    if isinstance(value, str) and value in QUERY_MODES:
+        return value
+    if isinstance(value, (list, tuple, set, frozenset)) and all(
+        isinstance(key, str) for key in value
+    ):
+        return tuple(sorted(value))
+
+    msg = f"Invalid `match_query` for {owner.__class__!r}: {value!r}. Expected one of {sorted(QUERY_MODES)} or a list of query string keys."
+    raise ImproperlyConfigured(msg)
+
+
+def query_matches(
+    policy: QueryPolicy, item_query: QueryKey, request_query: QueryKey
+) -> bool:
+    if policy == "ignore":
+        return True
+    if policy == "exact":
+        return item_query == request_query
+    request_params = dict(request_query)
+    if policy == "subset":
+        return all(request_params.get(key) == values for key, values in item_query)
+    item_params = dict(item_query)
+    return all(item_params.get(key) == request_params.get(key) for key in policy)
+
+
+def path_segments(path: str) -> tuple[str, ...]:
+    return tuple(segment for segment in path.split("/") if segment)
+
+
+def _source(request: HttpRequest) -> tuple[str, str]:
+    return request.path, request.META.get("QUERY_STRING", "")
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import cast
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_save
+
+from django_simple_nav.conf import app_settings
+
+from ._cache import _versions
+from ._cache import invalidate_cache
+
+DISPATCH_UID = "django_simple_nav"
+
+# the user fields that can change which items a user sees
+USER_FIELDS = frozenset({"is_active", "is_staff", "is_superuser"})
+
+M2M_ACTIONS = frozenset({"post_add", "post_remove", "post_clear"})
+
+
+def connect_signals() -> None:
+    """Invalidate cached navs when a user's permissions or flags change."""
+    if not apps.is_installed("django.contrib.auth"):
+        return
+
+    from django.contrib.auth.models import Group
+
+    user_model = get_user_model()
+    post_save.connect(user_saved, sender=user_model, dispatch_uid=DISPATCH_UID)
+
+    # custom user models without `PermissionsMixin` have neither relation
+    relations = [
+        getattr(user_model, "user_permissions", None),
+        getattr(user_model, "groups", None),
+        Group.permissions,
+    ]
+    for relation in relations:
+        if relation is not None:
+            m2m_changed.connect(
+                permissions_changed,
+                sender=relation.through,
+                dispatch_uid=DISPATCH_UID,
+            )
+
+
+def user_saved(
+    sender: type[Model],
+    instance: Model,
+    created: bool,
+    update_fields: frozenset[str] | None = None,
+    **kwargs: object,
+) -> None:
+    # a new user has nothing cached yet, and saves of unrelated fields like
+    # `last_login` on every login shouldn't throw the cache away
+    if created or (update_fields is not None and not USER_FIELDS & update_fields):
+        return
+    invalidate_navs(cast("str | None", kwargs.get("using")))
+
+
+def permissions_changed(sender: type[Model], action: str, **kwargs: object) -> None:
+    if action in M2M_ACTIONS:
+        invalidate_navs(cast("str | None", kwargs.get("using")))
+
+
+def invalidate_navs(using: str | None = None) -> None:
+    if not app_settings.INVALIDATE_ON_PERMISSION_CHANGE:
+        return
+    # nothing to invalidate unless caching is on, or a nav opted in to it
+    if not (app_settings.CACHE_ENABLED or _versions):
+        return
+    # once committed, so a concurrent request can't cache the old permissions
+    # again after the invalidation
+    transaction.on_commit(_invalidate_aliases, using=using)
+
+
+def _invalidate_aliases() -> None:
+    # every alias this process cached navs in, as well as the default one
+    for alias in {app_settings.CACHE_ALIAS, *list(_versions)}:
+        invalidate_cache(alias)
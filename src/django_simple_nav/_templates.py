@@ -1,17 +1,85 @@
 from __future__ import annotations
 
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import cast
+from weakref import WeakKeyDictionary
 
 from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpRequest
 from django.template import engines
 from django.template.backends.base import BaseEngine
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+from django.template.backends.utils import csrf_input_lazy
+from django.template.backends.utils import csrf_token_lazy
+from django.template.base import Template
+from django.template.context import RequestContext
+from django.utils.autoreload import file_changed
 
+from django_simple_nav.conf import DJANGO_SIMPLE_NAV_SETTINGS_NAME
 from django_simple_nav.conf import app_settings
 
+from ._typing import EngineTemplate
+from ._typing import override
+
+try:
+    from django.template.backends.jinja2 import Jinja2
+except ImportError:  # pragma: no cover
+    Jinja2 = None  # type: ignore[assignment,misc]
+
 logger = logging.getLogger(__name__)
 
+# the request being rendered and, per engine, its context processors' output
+_current_request_context: ContextVar[
+    tuple[HttpRequest, dict[BaseEngine, dict[str, object]]] | None
+] = ContextVar("django_simple_nav_request_context", default=None)
+
+# `using` -> selected engine, until `TEMPLATES` or `DJANGO_SIMPLE_NAV` changes
+_engines: dict[str | None, BaseEngine] = {}
+_engines_lock = threading.Lock()
+
+# engine -> template name -> loaded template, dropped with the engine when
+# `TEMPLATES` changes
+_templates: WeakKeyDictionary[BaseEngine, dict[str, EngineTemplate]] = (
+    WeakKeyDictionary()
+)
+
+# compiled string templates kept across renders
+STRING_TEMPLATE_CACHE_SIZE = 128
+
+# (engine alias, source hash) -> compiled template, least recently used first
+_string_templates: OrderedDict[tuple[str, str], EngineTemplate] = OrderedDict()
+_string_template_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_string_templates_lock = threading.Lock()
+
 
 def get_template_engine(using: str | None = None) -> BaseEngine:
+    """Return the engine items and inline templates are rendered with.
+
+    Selected once and reused until the `TEMPLATES` or `DJANGO_SIMPLE_NAV`
+    setting changes, so the multiple engines warning is only logged then.
+    """
+    try:
+        return _engines[using]
+    except KeyError:
+        pass
+    with _engines_lock:
+        engine = _engines.get(using)
+        if engine is None:
+            engine = _engines[using] = _select_template_engine(using)
+    return engine
+
+
+def _select_template_engine(using: str | None) -> BaseEngine:
     if template_backend := app_settings.TEMPLATE_BACKEND:
         # https://github.com/django/django/blob/082fe2b5a83571dec4aa97580af0fe8cf2a5214e/django/template/utils.py#L33-L42
         try:
@@ -37,3 +105,169 @@ def get_template_engine(using: str | None = None) -> BaseEngine:
         engine = all_engines[0] if using is None else engines[using]
 
     return engine
+
+
+def get_engine_template(engine: BaseEngine, template_name: str) -> EngineTemplate:
+    """Return `template_name` loaded by `engine`, loading it once per engine."""
+    templates = _templates.setdefault(engine, {})
+    template = templates.get(template_name)
+    if template is None:
+        template = cast(EngineTemplate, engine.get_template(template_name))
+        templates[template_name] = template
+    return template
+
+
+def get_string_template(engine: BaseEngine, source: str) -> EngineTemplate:
+    """Return `source` compiled by `engine`, compiling it once per engine."""
+    key = (engine.name, hashlib.sha256(source.encode()).hexdigest())
+    with _string_templates_lock:
+        cached = _string_templates.get(key)
+        if cached is not None:
+            _string_templates.move_to_end(key)
+            _string_template_stats["hits"] += 1
+            return cached
+        _string_template_stats["misses"] += 1
+
+    template = cast(EngineTemplate, engine.from_string(source))
+    with _string_templates_lock:
+        _string_templates[key] = template
+        while len(_string_templates) > STRING_TEMPLATE_CACHE_SIZE:
+            _string_templates.popitem(last=False)
+            _string_template_stats["evictions"] += 1
+    return template
+
+
+def get_string_template_stats() -> dict[str, int]:
+    """Return the hits, misses, evictions and size of the string template cache."""
+    with _string_templates_lock:
+        return {**_string_template_stats, "entries": len(_string_templates)}
+
+
+def clear_string_templates() -> None:
+    with _string_templates_lock:
+        _string_templates.clear()
+
+
+@contextmanager
+def rendering(request: HttpRequest) -> Iterator[None]:
+    """Share the context processors' output for `request` until exit.
+
+    Entered around a whole `Nav` render, so the processors run once per
+    render rather than once per item. Reuses an enclosing render of the same
+    request.
+    """
+    current = _current_request_context.get()
+    if current is not None and current[0] is request:
+        yield
+        return
+
+    token = _current_request_context.set((request, {}))
+    try:
+        yield
+    finally:
+        _current_request_context.reset(token)
+
+
+def get_request_context(
+    engine: BaseEngine, request: HttpRequest
+) -> dict[str, object] | None:
+    """Return the variables `engine` adds to the context of `request`.
+
+    These are what rendering a template with `request` adds: the output of
+    the engine's context processors and, for Jinja2, `request` and the CSRF
+    variables. They are computed once per `rendering()` of `request`, and on
+    every call outside of one. Returns `None` for other backends.
+    """
+    current = _current_request_context.get()
+    contexts = current[1] if current is not None and current[0] is request else {}
+    if (cached := contexts.get(engine)) is not None:
+        return cached
+
+    context: dict[str, object]
+    if isinstance(engine, DjangoTemplates):
+        context = {}
+        processors = engine.engine.template_context_processors
+    elif Jinja2 is not None and isinstance(engine, Jinja2):
+        context = {
+            "request": request,
+            "csrf_input": csrf_input_lazy(request),
+            "csrf_token": csrf_token_lazy(request),
+        }
+        processors = engine.template_context_processors
+    else:
+        return None
+
+    for processor in processors:
+        context.update(processor(request))
+    contexts[engine] = context
+    return context
+
+
+class ProcessedRequestContext(RequestContext):
+    """A `RequestContext` given its context processors' output up front.
+
+    Binding it to a template fills the processors' layer with that output
+    instead of running them again.
+    """
+
+    def __init__(
+        self,
+        request: HttpRequest,
+        processed: dict[str, object],
+        *,
+        autoescape: bool = True,
+    ) -> None:
+        super().__init__(request, autoescape=autoescape)
+        self._processed = processed
+
+    @override
+    @contextmanager
+    def bind_template(self, template: Template) -> Iterator[None]:
+        if self.template is not None:
+            msg = "Context is already bound to a template"
+            raise RuntimeError(msg)
+
+        self.template = template
+        # where `RequestContext.bind_template()` puts the processors' output
+        self.dicts[self._processors_index] = self._processed  # type: ignore[attr-defined,assignment]
+        try:
+            yield
+        finally:
+            self.template = None
+            self.dicts[self._processors_index] = {}  # type: ignore[attr-defined]
+
+
+def render_django_template(
+    template: EngineTemplate,
+    context: dict[str, object],
+    request: HttpRequest,
+    processed: dict[str, object],
+) -> str:
+    """Render a `DjangoTemplates` template as `template.render()` would.
+
+    The template still sees `request`, for `{% url %}` and tags that take the
+    context, but the context processors' output is `processed`, from
+    `get_request_context()`. The `context` takes precedence over it.
+    """
+    django_template = cast(DjangoTemplate, template)
+    request_context = ProcessedRequestContext(
+        request, processed, autoescape=django_template.backend.engine.autoescape
+    )
+    request_context.push(context)
+    return django_template.template.render(request_context)
+
+
+@receiver(setting_changed)
+def _clear_engines(*, setting: str, **kwargs: object) -> None:
+    if setting in {"TEMPLATES", DJANGO_SIMPLE_NAV_SETTINGS_NAME}:
+        _engines.clear()
+    # the aliases may now name other engines
+    if setting == "TEMPLATES":
+        clear_string_templates()
+
+
+@receiver(file_changed, dispatch_uid="django_simple_nav_template_changed")
+def reset_templates(sender: object, file_path: Path, **kwargs: object) -> None:
+    # like Django's cached template loader, reload templates when the
+    # autoreloader sees a file change
+    _templates.clear()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from enum import Enum
+from functools import lru_cache
+from urllib.parse import ParseResult
+from urllib.parse import urlparse
+from urllib.parse import urlunparse
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import URLResolver
+from django.urls import get_resolver
+from django.urls import get_script_prefix
+from django.urls import get_urlconf
+from django.urls import reverse
+from django.urls.exceptions import NoReverseMatch
+from django.utils.functional import Promise
+from django.utils.translation import get_language
+
+from ._request import QueryKey
+from ._request import query_key
+
+# settings that change how a URL spec resolves or is normalized
+URL_SETTINGS = frozenset({"APPEND_SLASH", "FORCE_SCRIPT_NAME", "ROOT_URLCONF"})
+
+
+# strings starting with one of these can only be literal URLs, never URL names
+LITERAL_PREFIXES = ("/", "#", "?", ".")
+
+
+class URLKind(Enum):
+    NONE = "none"
+    # paths, absolute URLs, anchors and bare query strings
+    LITERAL = "literal"
+    # anything else that is passed to `reverse()`, falling back to a literal
+    NAME = "name"
+    # django.urls.base.reverse_lazy
+    LAZY = "lazy"
+    CALLABLE = "callable"
+
+
+def classify_url(spec: object) -> URLKind:
+    if spec is None:
+        return URLKind.NONE
+    if isinstance(spec, Promise):
+        return URLKind.LAZY
+    if isinstance(spec, str):
+        if not spec or spec.startswith(LITERAL_PREFIXES) or "://" in spec:
+            return URLKind.LITERAL
+        return URLKind.NAME
+    if callable(spec):
+        return URLKind.CALLABLE
+    return URLKind.NAME
+
+
+def literal_urls(spec: str) -> tuple[str, str]:
+    """Return the normalized forms of a literal URL, indexed by `append_slash`."""
+    return normalize_url(spec, False), normalize_url(spec, True)
+
+
+class URLPartition:
+    """Resolved URLs for a single urlconf.
+
+    `get_resolver()` is itself cached and `clear_url_caches()` resets it, so a
+    partition is only valid while its resolver is still the current one.
+    """
+
+    __slots__ = ("urlconf", "resolver", "urls")
+
+    def __init__(self, urlconf: str | None, resolver: URLResolver) -> None:
+        self.urlconf = urlconf
+        self.resolver = resolver
+        # (spec key, script prefix, language, append slash) -> (spec, resolved url)
+        self.urls: dict[
+            tuple[object, str, str | None, bool], tuple[object, str | None]
+        ] = {}
+
+
+_partitions: dict[str | None, URLPartition] = {}
+
+
+@receiver(setting_changed)
+def _clear_partitions(*, setting: str, **kwargs: object) -> None:
+    if setting in URL_SETTINGS:
+        clear_url_cache()
+
+
+def clear_url_cache() -> None:
+    _partitions.clear()
+
+
+def get_partition() -> URLPartition:
+    """Return the partition for the active urlconf.
+
+    The active urlconf is the one set by `set_urlconf()`, which Django's
+    request handler points at `request.urlconf` when a middleware sets it.
+    """
+    urlconf = get_urlconf()
+    resolver = get_resolver(urlconf)
+    partition = _partitions.get(urlconf)
+    if partition is None or partition.resolver is not resolver:
+        partition = _partitions[urlconf] = URLPartition(urlconf, resolver)
+    return partition
+
+
+def resolve_url(
+    spec: str | Callable[..., str] | Promise | None, append_slash: bool
+) -> str | None:
+    """Resolve a `NavItem.url` spec to a slash-normalized URL.
+
+    String and `reverse_lazy` specs are cached per urlconf, script prefix,
+    language (for `i18n_patterns`) and `append_slash`. Callables are called every time, since nothing guarantees
+    they return the same URL twice.
+    """
+    if isinstance(spec, Promise):
+        # lazy proxies hash by evaluating themselves, so key on identity and
+        # keep the proxy alive alongside the cached URL
+        key: object = ("lazy", id(spec))
+    elif isinstance(spec, str):
+        key = spec
+    else:
+        return _resolve(spec, append_slash)
+
+    partition = get_partition()
+    cache_key = (key, get_script_prefix(), get_language(), append_slash)
+    if (cached := partition.urls.get(cache_key)) is not None:
+        return cached[1]
+
+    url = _resolve(spec, append_slash)
+    partition.urls[cache_key] = (spec, url)
+    return url
+
+
+def _resolve(
+    spec: str | Callable[..., str] | Promise | None, append_slash: bool
+) -> str | None:
+    url: str | None
+
+    if isinstance(spec, Promise):
+        # django.urls.base.reverse_lazy
+        url = str(spec)
+    elif callable(spec):
+        # django.urls.base.reverse (or some other basic callable)
+        url = spec()
+    else:
+        try:
+            url = reverse(spec)
+        except NoReverseMatch:
+            url = spec
+
+    if url is None:
+        return None
+
+    return normalize_url(url, append_slash)
+
+
+@lru_cache(maxsize=1024)
+def normalize_url(url: str, append_slash: bool) -> str:
+    parsed_url = urlparse(url)
+    path = parsed_url.path
+    if append_slash and not path.endswith("/"):
+        path += "/"
+    return urlunparse((
+        parsed_url.scheme,
+        parsed_url.netloc,
+        path,
+        parsed_url.params,
+        parsed_url.query,
+        parsed_url.fragment,
+    ))
+
+
+@lru_cache(maxsize=1024)
+def split_url(url: str) -> tuple[ParseResult, QueryKey]:
+    """Parse a resolved URL and its query string once per distinct URL."""
+    parsed_url = urlparse(url)
+    return parsed_url, query_key(parsed_url.query)
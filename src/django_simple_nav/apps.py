@@ -2,6 +2,14 @@ from __future__ import annotations
 
 from django.apps import AppConfig
 
+from ._typing import override
+
 
 class DjangoSimpleNavConfig(AppConfig):
     name = "django_simple_nav"
+
+    @override
+    def ready(self) -> None:
+        from ._signals import connect_signals
+
+        connect_signals()
@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+from ._cache import get_cache_stats
+from ._cache import invalidate_cache
+from ._templates import get_string_template_stats
+
+__all__ = ["get_cache_stats", "get_string_template_stats", "invalidate_cache"]
@@ -3,20 +3,50 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
 from ._typing import override
 
 DJANGO_SIMPLE_NAV_SETTINGS_NAME = "DJANGO_SIMPLE_NAV"
 
+# attribute name -> resolved value, until `DJANGO_SIMPLE_NAV` changes
+_values: dict[str, object] = {}
+
 
 @dataclass(frozen=True)
 class AppSettings:
+    BATCH_PERMISSIONS: bool = False
+    CACHE_ALIAS: str = "default"
+    CACHE_ENABLED: bool = False
+    CACHE_LOCK_TIMEOUT: int = 10
+    CACHE_MODE: str = "path"
+    CACHE_SPLICE_MAX_NODES: int = 50
+    CACHE_STALE_TIMEOUT: int = 0
+    CACHE_TIMEOUT: int | None = 300
+    INVALIDATE_ON_PERMISSION_CHANGE: bool = True
+    LOCAL_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    LOCAL_CACHE_MAX_ENTRIES: int = 0
+    LOCAL_CACHE_TIMEOUT: int = 60
+    LOCAL_CACHE_VERSION_INTERVAL: int = 1
     TEMPLATE_BACKEND: str | None = None
 
     @override
     def __getattribute__(self, __name: str) -> object:
+        try:
+            return _values[__name]
+        except KeyError:
+            pass
         user_settings = getattr(settings, DJANGO_SIMPLE_NAV_SETTINGS_NAME, {})
-        return user_settings.get(__name, super().__getattribute__(__name))  # pyright: ignore[reportAny]
+        value = user_settings.get(__name, super().__getattribute__(__name))  # pyright: ignore[reportAny]
+        _values[__name] = value
+        return value
+
+
+@receiver(setting_changed)
+def _clear_values(*, setting: str, **kwargs: object) -> None:
+    if setting == DJANGO_SIMPLE_NAV_SETTINGS_NAME:
+        _values.clear()
 
 
 app_settings = AppSettings()
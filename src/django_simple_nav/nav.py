@@ -1,29 +1,48 @@
 from __future__ import annotations
 
 import logging
+import re
 from collections.abc import Callable
 from dataclasses import dataclass
 from dataclasses import field
+from functools import cached_property
 from typing import cast
-from urllib.parse import parse_qs
-from urllib.parse import urlparse
-from urllib.parse import urlunparse
 
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpRequest
+from django.template.backends.django import DjangoTemplates
 from django.template.loader import get_template
-from django.template.loader import render_to_string
-from django.urls import reverse
-from django.urls.exceptions import NoReverseMatch
 from django.utils.functional import Promise
 from django.utils.safestring import mark_safe
 
+from ._cache import render_cached
+from ._client import ACTIVE_MODES
+from ._client import node_prefix
+from ._evaluator import evaluation
+from ._native import get_native_renderer
+from ._permissions import user_has_perm
+from ._plan import get_nav_plan
+from ._request import QueryPolicy
+from ._request import parse_request
+from ._request import path_segments
+from ._request import query_matches
+from ._request import query_policy
+from ._templates import get_engine_template
+from ._templates import get_request_context
+from ._templates import get_string_template
 from ._templates import get_template_engine
+from ._templates import render_django_template
+from ._templates import rendering
 from ._typing import EngineTemplate
 from ._typing import override
+from ._urls import URLKind
+from ._urls import classify_url
+from ._urls import literal_urls
+from ._urls import resolve_url
+from ._urls import split_url
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +54,8 @@ USER_ATTRIBUTE_PERMISSIONS = frozenset({
     "is_superuser",
 })
 
+MATCH_MODES = frozenset({"exact", "prefix", "longest_prefix", "view"})
+
 
 class NavItemContext(dict):
     """A dict subclass that can render itself as HTML in templates.
@@ -50,11 +71,14 @@ class NavItemContext(dict):
         *,
         nav_item: NavGroup | NavItem | None = None,
         request: HttpRequest | None = None,
+        prerendered: str | None = None,
     ) -> None:
         super().__init__(data)
         self._nav_item = nav_item
         self._request = request
         self._rendered: str | None = None
+        # the built-in template's output, rendered ahead by a generated build
+        self._prerendered = prerendered
 
     def __str__(self) -> str:
         if self._rendered is None:
@@ -67,22 +91,42 @@ class NavItemContext(dict):
     def _render(self) -> str:
         if self._nav_item is None or self._request is None:
             return ""
-        context = dict(self)
-        return mark_safe(
-            render_to_string(self._nav_item.get_template_name(), context, self._request)
-        )
+        # rendered through the selected engine with a cached template, and
+        # the request's context processors run once per nav render
+        engine = get_template_engine()
+        template_name = self._nav_item.get_template_name()
+        # the built-in templates are rendered without the template engine
+        renderer = get_native_renderer(engine, template_name, self._request)
+        if renderer is not None and self._prerendered is not None:
+            return mark_safe(self._prerendered)
+        if renderer is not None and (html := renderer(self)) is not None:
+            return mark_safe(html)
+
+        template = get_engine_template(engine, template_name)
+        request_context = get_request_context(engine, self._request)
+        if request_context is None:
+            return mark_safe(template.render(dict(self), self._request))
+        if isinstance(engine, DjangoTemplates):
+            return mark_safe(
+                render_django_template(
+                    template, dict(self), self._request, request_context
+                )
+            )
+        # Jinja2 lets context processors override the context
+        return mark_safe(template.render({**self, **request_context}))
 
 
 def _build_renderable_context(
     item: NavGroup | NavItem, request: HttpRequest
 ) -> NavItemContext:
     """Build a NavItemContext for a nav item, recursively wrapping children."""
-    context = item.get_context_data(request)
-    child_items = item.get_items(request)
-    if child_items is not None:
-        context["items"] = [
-            _build_renderable_context(child, request) for child in child_items
-        ]
+    with evaluation(request) as evaluator:
+        context = dict(evaluator.get_context_data(item))
+        child_items = evaluator.get_items(item)
+        if child_items is not None:
+            context["items"] = [
+                _build_renderable_context(child, request) for child in child_items
+            ]
     return NavItemContext(context, nav_item=item, request=request)
 
 
@@ -90,35 +134,80 @@ def _build_renderable_context(
 class Nav:
     template_name: str | None = field(init=False, default=None)
     items: list[NavGroup | NavItem] | None = field(init=False, default=None)
+    match_query: str | list[str] = field(init=False, default="exact")
+    cache_enabled: bool | None = field(init=False, default=None)
+    cache_alias: str | None = field(init=False, default=None)
+    cache_timeout: int | None = field(init=False, default=None)
+    cache_stale_timeout: int | None = field(init=False, default=None)
+    cache_mode: str | None = field(init=False, default=None)
+    active_mode: str = field(init=False, default="server")
+    codegen: bool = field(init=False, default=False)
 
     def __init__(
         self,
         *,
         template_name: str | None = None,
         items: list[NavGroup | NavItem] | None = None,
+        match_query: str | list[str] | None = None,
     ) -> None:
         if template_name is not None:
             object.__setattr__(self, "template_name", template_name)
         if items is not None:
             object.__setattr__(self, "items", items)
+        if match_query is not None:
+            object.__setattr__(self, "match_query", match_query)
 
     def render(self, request: HttpRequest, template_name: str | None = None) -> str:
+        if (html := render_cached(self, request, template_name)) is not None:
+            return html
+        return self._render(request, template_name)
+
+    def _render(self, request: HttpRequest, template_name: str | None = None) -> str:
         context = self.get_context_data(request)
+        return self._render_context(context, request, template_name)
+
+    def _render_context(
+        self,
+        context: dict[str, object],
+        request: HttpRequest,
+        template_name: str | None = None,
+    ) -> str:
         template = self.get_template(template_name)
         if isinstance(template, str):
-            engine = get_template_engine()
-            template: EngineTemplate = engine.from_string(template)  # type: ignore[no-redef]
-        return template.render(context, request)
+            template = get_string_template(get_template_engine(), template)
+        # items are rendered lazily by the nav's template
+        with rendering(request):
+            return template.render(context, request)
 
     def get_context_data(self, request: HttpRequest) -> dict[str, object]:
-        items = self.get_items(request)
-        return {
-            "items": [_build_renderable_context(item, request) for item in items],
-        }
+        if self.active_mode not in ACTIVE_MODES:
+            msg = f"Invalid `active_mode` for {self.__class__!r}: {self.active_mode!r}. Expected one of {sorted(ACTIVE_MODES)}."
+            raise ImproperlyConfigured(msg)
+        client = self.active_mode == "client"
+
+        if (plan := get_nav_plan(self)) is not None:
+            return {
+                "items": plan.evaluate(request, client=client, codegen=self.codegen)
+            }
+
+        nav_class = type(self)
+        client_prefix = (
+            node_prefix(f"{nav_class.__module__}.{nav_class.__qualname__}")
+            if client
+            else None
+        )
+        with evaluation(request, query_policy(self.match_query, self), client_prefix):
+            items = self.get_items(request)
+            return {
+                "items": [_build_renderable_context(item, request) for item in items],
+            }
 
     def get_items(self, request: HttpRequest) -> list[NavGroup | NavItem]:
         if self.items is not None:
-            return [item for item in self.items if item.check_permissions(request)]
+            with evaluation(request) as evaluator:
+                return [
+                    item for item in self.items if evaluator.check_permissions(item)
+                ]
 
         msg = f"{self.__class__!r} must define 'items' or override 'get_items()'"
         raise ImproperlyConfigured(msg)
@@ -144,14 +233,59 @@ class NavItem:
     extra_context: dict[str, object] = field(default_factory=dict)
     append_slash: bool | None = None
     template_name: str | None = None
+    match: str = "exact"
+    active_patterns: list[str] = field(default_factory=list)
+    match_query: str | list[str] | None = None
+
+    def __post_init__(self) -> None:
+        if self.match not in MATCH_MODES:
+            msg = f"Invalid `match` for {self.__class__!r}: {self.match!r}. Expected one of {sorted(MATCH_MODES)}."
+            raise ImproperlyConfigured(msg)
+
+        # computed up front so an invalid item fails where it is defined;
+        # subclasses with their own `__post_init__` compute them on first use
+        self._active_regexes  # noqa: B018
+        self._query_policy  # noqa: B018
+
+        if self.match == "view" and self._url_kind is not URLKind.NAME:
+            msg = f"{self.__class__!r} must define 'url' as a URL name to use `match='view'`"
+            raise ImproperlyConfigured(msg)
+
+    @cached_property
+    def _active_regexes(self) -> tuple[re.Pattern[str], ...]:
+        try:
+            return tuple(re.compile(p) for p in self.active_patterns)
+        except re.error as err:
+            msg = f"Invalid `active_patterns` for {self.__class__!r}: {err}"
+            raise ImproperlyConfigured(msg) from err
+
+    @cached_property
+    def _query_policy(self) -> QueryPolicy | None:
+        return (
+            None if self.match_query is None else query_policy(self.match_query, self)
+        )
+
+    @cached_property
+    def _url_kind(self) -> URLKind:
+        # classified once so literal URLs skip `reverse()` entirely
+        return classify_url(self.url)
+
+    @cached_property
+    def _literal_urls(self) -> tuple[str, str] | None:
+        if self._url_kind is URLKind.LITERAL:
+            return literal_urls(cast(str, self.url))
+        return None
 
     def get_context_data(self, request: HttpRequest) -> dict[str, object]:
-        context = {
-            "title": self.get_title(),
-            "url": self.get_url(),
-            "active": self.get_active(request),
-            "items": self.get_items(request),
-        }
+        with evaluation(request) as evaluator:
+            context = {
+                "title": self.get_title(),
+                "url": evaluator.get_url(self),
+                "active": evaluator.get_active(self),
+                "items": evaluator.get_items(self),
+            }
+            if evaluator.client_prefix is not None:
+                context["match_attrs"] = evaluator.get_match_attrs(self)
         # filter out any items in `extra_context` that may be shadowing the
         # above `context` dict
         extra_context = {
@@ -170,68 +304,71 @@ class NavItem:
         return "django_simple_nav/navitem.html"
 
     def render(self, request: HttpRequest) -> str:
-        return str(_build_renderable_context(self, request))
+        with evaluation(request), rendering(request):
+            return str(_build_renderable_context(self, request))
 
     def get_title(self) -> str:
         return mark_safe(self.title)
 
     def get_url(self) -> str:
-        url: str | None
-
-        if isinstance(self.url, Promise):
-            # django.urls.base.reverse_lazy
-            url = str(self.url)
-        elif callable(self.url):
-            # django.urls.base.reverse (or some other basic callable)
-            url = self.url()
-        else:
-            try:
-                url = reverse(self.url)
-            except NoReverseMatch:
-                url = self.url
-
-        if url is not None:
-            parsed_url = urlparse(url)
-            path = parsed_url.path
-            should_append = (
-                self.append_slash
-                if self.append_slash is not None
-                else settings.APPEND_SLASH
-            )
-            if should_append and not path.endswith("/"):
-                path += "/"
-            url = urlunparse(
-                (
-                    parsed_url.scheme,
-                    parsed_url.netloc,
-                    path,
-                    parsed_url.params,
-                    parsed_url.query,
-                    parsed_url.fragment,
-                )
-            )
-            return url
+        should_append = (
+            self.append_slash
+            if self.append_slash is not None
+            else settings.APPEND_SLASH
+        )
+        if self._literal_urls is not None:
+            return self._literal_urls[should_append]
+
+        if self._url_kind is not URLKind.NONE:
+            url = resolve_url(self.url, should_append)
+            if url is not None:
+                return url
 
         msg = f"{self.__class__!r} must define 'url' or override 'get_url()'"
         raise ImproperlyConfigured(msg)
 
     def get_active(self, request: HttpRequest) -> bool:
-        try:
-            url = self.get_url()
-        except ImproperlyConfigured:
-            url = None
+        if self._active_regexes:
+            path = parse_request(request).path
+            if any(regex.search(path) for regex in self._active_regexes):
+                return True
+
+        if self.match == "view":
+            # compare against the view Django already resolved, falling back to
+            # comparing URLs if the request was never resolved
+            resolver_match = getattr(request, "resolver_match", None)
+            if resolver_match is not None:
+                return resolver_match.view_name == self.url
+
+        with evaluation(request) as evaluator:
+            try:
+                url = evaluator.get_url(self)
+            except ImproperlyConfigured:
+                url = None
+            # items without their own policy follow the `Nav` being rendered
+            policy = (
+                self._query_policy
+                if self._query_policy is not None
+                else evaluator.match_query
+            )
 
         if not url:
             return False
 
-        parsed_url = urlparse(url)
-        parsed_request = urlparse(request.build_absolute_uri())
+        parsed_url, url_query = split_url(url)
+        parsed_request = parse_request(request)
 
         if (parsed_url.scheme and (parsed_url.scheme != parsed_request.scheme)) or (
             parsed_url.netloc and (parsed_url.netloc != parsed_request.netloc)
         ):
             return False
 
+        if self.match in ("prefix", "longest_prefix"):
+            # outside of a compiled `Nav` there is nothing to compete with, so
+            # `longest_prefix` behaves like `prefix`
+            segments = path_segments(parsed_url.path)
+            return parsed_request.segments[: len(segments)] == segments
+
         url_path = parsed_url.path
         request_path = parsed_request.path
 
@@ -242,12 +379,11 @@ class NavItem:
         )
         if should_append:
             url_path = url_path.rstrip("/") + "/"
-            request_path = request_path.rstrip("/") + "/"
-
-        url_query = parse_qs(parsed_url.query)
-        request_query = parse_qs(parsed_request.query)
+            request_path = parsed_request.path_slash
 
-        return url_path == request_path and url_query == request_query
+        return url_path == request_path and query_matches(
+            policy, url_query, parsed_request.query_key
+        )
 
     def get_items(self, request: HttpRequest) -> list[NavGroup | NavItem] | None:
         # this needs to be set to shadow the built-in `items()` of the dict
@@ -294,7 +430,7 @@ class NavItem:
             elif perm in USER_ATTRIBUTE_PERMISSIONS:
                 has_perm = getattr(user, perm, False)
             else:
-                has_perm = user.has_perm(perm)
+                has_perm = user_has_perm(request, perm)
 
             permission_checks.append(has_perm)
 
@@ -316,20 +452,25 @@ class NavGroup(NavItem):
 
     @override
     def get_context_data(self, request: HttpRequest) -> dict[str, object]:
-        context = super().get_context_data(request)
+        with evaluation(request) as evaluator:
+            context = super().get_context_data(request)
 
-        items = self.get_items(request)
-        context["items"] = [item.get_context_data(request) for item in items]
+            items = evaluator.get_items(self) or []
+            context["items"] = [evaluator.get_context_data(item) for item in items]
 
         return context
 
     @override
     def get_items(self, request: HttpRequest) -> list[NavGroup | NavItem]:
-        return [item for item in self.items if item.check_permissions(request)]
+        with evaluation(request) as evaluator:
+            return [item for item in self.items if evaluator.check_permissions(item)]
 
     @override
     def get_url(self) -> str:
+        if self._url_kind is URLKind.NONE:
+            return ""
         try:
+            # a callable may still return `None`
             url = super().get_url()
         except ImproperlyConfigured:
             return ""
@@ -339,18 +480,20 @@ class NavGroup(NavItem):
     def get_active(self, request: HttpRequest) -> bool:
         if super().get_active(request):
             return True
-        items = self.get_items(request)
-        return any(item.get_active(request) for item in items)
+        with evaluation(request) as evaluator:
+            items = evaluator.get_items(self) or []
+            return any(evaluator.get_active(item) for item in items)
 
     @override
     def check_permissions(self, request: HttpRequest) -> bool:
         has_perm = super().check_permissions(request)
 
-        sub_items = [
-            sub_item
-            for sub_item in self.items
-            if sub_item.check_permissions(request) is not False
-        ]
+        with evaluation(request) as evaluator:
+            sub_items = [
+                sub_item
+                for sub_item in self.items
+                if evaluator.check_permissions(sub_item) is not False
+            ]
         if not sub_items and not self.url:
             has_perm = False
 
@@ -0,0 +1,168 @@
+// Marks the items of navs rendered with `active_mode = "client"` that match
+// the current location, mirroring the server-side active matching.
+//
+//   <script src="{% static 'django_simple_nav/active.js' %}" data-active-class="active" defer></script>
+//
+// Call `window.djangoSimpleNav.update()` after client-side navigation.
+(function () {
+  "use strict";
+
+  var script = document.currentScript;
+  var activeClass = (script && script.dataset.activeClass) || "active";
+
+  function segments(path) {
+    return path.split("/").filter(Boolean);
+  }
+
+  // like `parse_qs()`, blank values are dropped and repeated keys keep their order
+  function parseQuery(search) {
+    var params = {};
+    new URLSearchParams(search).forEach(function (value, key) {
+      if (value !== "") {
+        (params[key] = params[key] || []).push(value);
+      }
+    });
+    return params;
+  }
+
+  function sameValues(a, b) {
+    a = a || [];
+    b = b || [];
+    return (
+      a.length === b.length &&
+      a.every(function (value, i) {
+        return value === b[i];
+      })
+    );
+  }
+
+  function queryMatches(data, requestQuery) {
+    var mode = data.navQueryMode || "exact";
+    if (mode === "ignore") {
+      return true;
+    }
+    var itemQuery = parseQuery(data.navQuery || "");
+    var keys;
+    if (mode === "exact") {
+      keys = Object.keys(itemQuery).concat(Object.keys(requestQuery));
+    } else if (mode === "subset") {
+      keys = Object.keys(itemQuery);
+    } else {
+      keys = data.navQueryKeys.split(" ");
+    }
+    return keys.every(function (key) {
+      return sameValues(itemQuery[key], requestQuery[key]);
+    });
+  }
+
+  function patternMatches(data, path) {
+    return JSON.parse(data.navPatterns).some(function (pattern) {
+      try {
+        return new RegExp(pattern).test(path);
+      } catch (e) {
+        // a Python-only pattern, only matched on the server
+        return false;
+      }
+    });
+  }
+
+  // returns the number of matched path segments, or -1
+  function matchDepth(data, request) {
+    if (!data.navMatch) {
+      return -1;
+    }
+    if (data.navScheme && data.navScheme + ":" !== request.protocol) {
+      return -1;
+    }
+    if (data.navHost && data.navHost !== request.host) {
+      return -1;
+    }
+    if (data.navMatch === "exact") {
+      var path = data.navAppendSlash ? request.pathSlash : request.path;
+      return path === data.navPath && queryMatches(data, request.query) ? 0 : -1;
+    }
+    var itemSegments = segments(data.navPath);
+    var matches = itemSegments.every(function (segment, i) {
+      return segment === request.segments[i];
+    });
+    return matches ? itemSegments.length : -1;
+  }
+
+  function findActive(request) {
+    var active = [];
+    // longest prefix matches compete within their nav, keyed by node id prefix
+    var longest = {};
+    document.querySelectorAll("[data-nav-node]").forEach(function (el) {
+      var data = el.dataset;
+      if (data.navPatterns && patternMatches(data, request.path)) {
+        active.push(data.navNode);
+        return;
+      }
+      var depth = matchDepth(data, request);
+      if (depth < 0) {
+        return;
+      }
+      if (data.navMatch !== "longest_prefix") {
+        active.push(data.navNode);
+        return;
+      }
+      var nav = data.navNode.split("-")[0];
+      var best = longest[nav];
+      if (!best || depth > best.depth) {
+        longest[nav] = { depth: depth, nodes: [data.navNode] };
+      } else if (depth === best.depth) {
+        best.nodes.push(data.navNode);
+      }
+    });
+    Object.keys(longest).forEach(function (nav) {
+      active = active.concat(longest[nav].nodes);
+    });
+    return active;
+  }
+
+  function nodes(id) {
+    return document.querySelectorAll('[data-nav-node="' + id + '"]');
+  }
+
+  function update() {
+    // percent-encoded, like the path the server matches and `data-nav-path`
+    var path = window.location.pathname;
+    var request = {
+      protocol: window.location.protocol,
+      host: window.location.host,
+      path: path,
+      pathSlash: path.replace(/\/+$/, "") + "/",
+      segments: segments(path),
+      query: parseQuery(window.location.search),
+    };
+
+    document.querySelectorAll("[data-nav-node]").forEach(function (el) {
+      el.classList.remove(activeClass);
+      el.removeAttribute("aria-current");
+    });
+
+    var seen = {};
+    findActive(request).forEach(function (id) {
+      // every group above an active item is active too
+      while (id && !seen[id]) {
+        seen[id] = true;
+        var parent = null;
+        nodes(id).forEach(function (el) {
+          el.classList.add(activeClass);
+          el.setAttribute("aria-current", "page");
+          parent = el.dataset.navParent || null;
+        });
+        id = parent;
+      }
+    });
+  }
+
+  window.djangoSimpleNav = { update: update };
+
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", update);
+  } else {
+    update();
+  }
+  window.addEventListener("popstate", update);
+})();
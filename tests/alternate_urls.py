@@ -0,0 +1,9 @@
+from __future__ import annotations
+
+from django.urls import path
+
+from tests.urls import fake_view
+
+urlpatterns = [
+    path("alternate/fake-view/", fake_view, name="fake-view"),
+]
@@ -0,0 +1,10 @@
+from __future__ import annotations
+
+from django.conf.urls.i18n import i18n_patterns
+from django.urls import path
+
+from tests.urls import fake_view
+
+urlpatterns = i18n_patterns(
+    path("fake-view/", fake_view, name="fake-view"),
+)
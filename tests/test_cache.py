@@ -0,0 +1,566 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import get_script_prefix
+from django.urls import set_script_prefix
+from django.utils import translation
+from django.utils.functional import lazy
+from model_bakery import baker
+
+from django_simple_nav import _cache
+from django_simple_nav._cache import VERSION_KEY
+from django_simple_nav._cache import apply_fragments
+from django_simple_nav._cache import get_cache_key
+from django_simple_nav._cache import get_version
+from django_simple_nav._plan import get_nav_plan
+from django_simple_nav.cache import get_cache_stats
+from django_simple_nav.cache import invalidate_cache
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavGroup
+from django_simple_nav.nav import NavItem
+
+pytestmark = pytest.mark.django_db
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "navs": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "navs",
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache():
+    with override_settings(CACHES=CACHES, DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True}):
+        yield
+        for alias in CACHES:
+            caches[alias].clear()
+    _cache._versions.clear()
+    _cache._local_caches.clear()
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    renders = []
+    render = Nav._render
+
+    def counting_render(self, request, template_name=None):
+        renders.append(request.path)
+        return render(self, request, template_name)
+
+    monkeypatch.setattr(Nav, "_render", counting_render)
+    return renders
+
+
+class CachedNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    items = [
+        NavItem(title="Home", url="/"),
+        NavItem(title="About", url="/about/"),
+        NavGroup(
+            title="Staff",
+            url="/staff/",
+            permissions=["is_staff"],
+            items=[NavItem(title="Reports", url="/staff/reports/")],
+        ),
+        NavItem(title="Private", url="/private/", permissions=["tests.private"]),
+    ]
+
+
+def entries(alias="default"):
+    return [key for key in caches[alias]._cache if not key.endswith(VERSION_KEY)]
+
+
+def stored_key(nav, req, alias="default"):
+    return f"{get_cache_key(nav, req)}:{get_version(alias)}"
+
+
+def request_for(rf, path="/", user=None):
+    req = rf.get(path)
+    req.user = user or AnonymousUser()
+    return req
+
+
+def test_render_cached(renders, rf):
+    first = CachedNav().render(request_for(rf))
+    second = CachedNav().render(request_for(rf))
+
+    assert first == second
+    assert "Home" in second
+    assert renders == ["/"]
+
+
+@override_settings(DJANGO_SIMPLE_NAV={})
+def test_render_cache_disabled_by_default(renders, rf):
+    CachedNav().render(request_for(rf))
+    CachedNav().render(request_for(rf))
+
+    assert len(renders) == 2
+
+
+def test_render_cache_disabled_per_nav(renders, rf):
+    class UncachedNav(CachedNav):
+        cache_enabled = False
+
+    UncachedNav().render(request_for(rf))
+    UncachedNav().render(request_for(rf))
+
+    assert len(renders) == 2
+
+
+@override_settings(DJANGO_SIMPLE_NAV={})
+def test_render_cache_enabled_per_nav(renders, rf):
+    class EnabledNav(CachedNav):
+        cache_enabled = True
+        cache_alias = "navs"
+
+    EnabledNav().render(request_for(rf))
+    EnabledNav().render(request_for(rf))
+
+    assert len(renders) == 1
+    assert len(entries("navs")) == 1
+    assert entries("default") == []
+
+
+def test_render_cache_timeout(rf, monkeypatch):
+    class TimeoutNav(CachedNav):
+        cache_timeout = 10
+
+    timeouts = []
+    monkeypatch.setattr(
+        caches["default"], "set", lambda key, value, timeout: timeouts.append(timeout)
+    )
+
+    TimeoutNav().render(request_for(rf))
+
+    assert timeouts == [10]
+
+
+def test_render_cache_varies_by_path(renders, rf):
+    CachedNav().render(request_for(rf, "/"))
+    CachedNav().render(request_for(rf, "/about/"))
+    CachedNav().render(request_for(rf, "/about/"))
+
+    assert renders == ["/", "/about/"]
+
+
+def test_render_cache_key_varies_by_query(rf):
+    keys = {
+        get_cache_key(CachedNav(), request_for(rf, path))
+        for path in ["/?a=1&b=2", "/?b=2&a=1", "/?a=2"]
+    }
+
+    assert len(keys) == 2
+
+
+def test_render_cache_key_varies_by_template_name(rf):
+    req = request_for(rf)
+
+    assert get_cache_key(CachedNav(), req) != get_cache_key(
+        CachedNav(), req, "tests/alternate.html"
+    )
+
+
+def test_render_cache_key_varies_by_language(rf):
+    req = request_for(rf)
+
+    with translation.override("en"):
+        english = get_cache_key(CachedNav(), req)
+    with translation.override("fr"):
+        french = get_cache_key(CachedNav(), req)
+
+    assert english != french
+
+
+def test_render_cache_key_permission_profile(rf):
+    staff = baker.make(get_user_model(), is_staff=True)
+    other_staff = baker.make(get_user_model(), is_staff=True)
+    user = baker.make(get_user_model())
+
+    assert get_cache_key(CachedNav(), request_for(rf, user=staff)) == get_cache_key(
+        CachedNav(), request_for(rf, user=other_staff)
+    )
+    assert get_cache_key(CachedNav(), request_for(rf, user=staff)) != get_cache_key(
+        CachedNav(), request_for(rf, user=user)
+    )
+
+
+def test_render_cache_permission_profile_output(rf):
+    staff = CachedNav().render(
+        request_for(rf, user=baker.make(get_user_model(), is_staff=True))
+    )
+    anonymous = CachedNav().render(request_for(rf))
+
+    assert "Reports" in staff
+    assert "Reports" not in anonymous
+
+
+def test_render_cache_key_definition_hash():
+    class FirstNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Home", url="/", permissions=[lambda request: True])]
+
+    class SecondNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Home!", url="/", permissions=[lambda request: True])]
+
+    first = get_nav_plan(FirstNav())
+    second = get_nav_plan(SecondNav())
+
+    assert first.definition_hash != second.definition_hash
+    assert first.definition_hash == get_nav_plan(FirstNav()).definition_hash
+
+
+class Icon:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_render_cache_key_definition_hash_stable():
+    def definition_hash():
+        # a new class, as each process compiles its own plan
+        class StableNav(Nav):
+            template_name = "tests/dummy_nav.html"
+            items = [
+                NavItem(
+                    title=lazy(translation.get_language, str)(),
+                    url="/",
+                    extra_context={"icon": Icon("home"), "tags": {"a", "b", "c"}},
+                )
+            ]
+
+        return get_nav_plan(StableNav()).definition_hash
+
+    with translation.override("en"):
+        english = definition_hash()
+    with translation.override("de"):
+        german = definition_hash()
+
+    assert english == german
+
+
+@pytest.mark.parametrize(
+    "nav",
+    [
+        Nav(template_name="tests/dummy_nav.html", items=CachedNav.items),
+        type(
+            "CallableURLNav",
+            (CachedNav,),
+            {"items": [NavItem(title="Callable", url=lambda: "/")]},
+        )(),
+        type(
+            "ContextNav",
+            (CachedNav,),
+            {"get_context_data": lambda self, request: {"items": []}},
+        )(),
+    ],
+)
+def test_render_cache_skipped(nav, rf):
+    assert get_cache_key(nav, request_for(rf)) is None
+
+
+def test_render_cache_skipped_for_uncacheable_callable(rf):
+    def is_beta(request):
+        return True
+
+    is_beta.cacheable = False
+
+    class BetaNav(CachedNav):
+        items = [NavItem(title="Beta", url="/beta/", permissions=[is_beta])]
+
+    assert get_cache_key(BetaNav(), request_for(rf)) is None
+
+
+class SpliceNav(CachedNav):
+    template_name = "tests/active_nav.html"
+    cache_mode = "splice"
+    items = [
+        *CachedNav.items,
+        NavItem(title="Docs", url="/docs/", match="prefix"),
+        NavItem(title="Guides", url="/docs/guides/", match="prefix"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "path", ["/", "/about/", "/staff/", "/staff/reports/", "/docs/guides/", "/nope/"]
+)
+def test_render_splice_matches_full_render(path, rf):
+    staff = baker.make(get_user_model(), is_staff=True)
+
+    spliced = SpliceNav().render(request_for(rf, path, staff))
+
+    assert spliced == SpliceNav()._render(request_for(rf, path, staff))
+
+
+def test_render_splice_renders_once_per_profile(renders, rf):
+    for path in ["/", "/about/", "/docs/"]:
+        SpliceNav().render(request_for(rf, path))
+
+    assert renders == []
+    assert len(entries()) == 1
+
+
+def test_render_splice_key_ignores_path(rf):
+    assert get_cache_key(SpliceNav(), request_for(rf, "/"), splice=True) == (
+        get_cache_key(SpliceNav(), request_for(rf, "/about/?a=1"), splice=True)
+    )
+    assert get_cache_key(SpliceNav(), request_for(rf, "/"), splice=True) != (
+        get_cache_key(SpliceNav(), request_for(rf, "/"))
+    )
+
+
+@override_settings(DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True, "CACHE_MODE": "splice"})
+def test_render_splice_setting(rf):
+    CachedNav().render(request_for(rf))
+
+    assert all(":splice:" in key for key in entries())
+
+
+def test_render_splice_unspliceable_template(renders, rf):
+    class OpenNav(SpliceNav):
+        template_name = "tests/open_nav.html"
+
+    staff = baker.make(get_user_model(), is_staff=True)
+    html = OpenNav().render(request_for(rf, "/staff/reports/", staff))
+
+    assert html == OpenNav()._render(request_for(rf, "/staff/reports/", staff))
+    assert 'class="open"' in html
+    assert renders == ["/staff/reports/", "/staff/reports/"]
+    # cached per URL instead
+    assert OpenNav().render(request_for(rf, "/staff/reports/", staff)) == html
+    assert len(renders) == 2
+
+
+def test_render_splice_max_nodes(renders, rf):
+    class LargeNav(SpliceNav):
+        items = [NavItem(title=f"Item {idx}", url=f"/{idx}/") for idx in range(6)]
+
+    build_renders = []
+    render_context = Nav._render_context
+
+    def counting_render_context(self, *args, **kwargs):
+        build_renders.append(args)
+        return render_context(self, *args, **kwargs)
+
+    with (
+        override_settings(
+            DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True, "CACHE_SPLICE_MAX_NODES": 5}
+        ),
+        pytest.MonkeyPatch.context() as m,
+    ):
+        m.setattr(Nav, "_render_context", counting_render_context)
+        html = LargeNav().render(request_for(rf, "/1/"))
+        LargeNav().render(request_for(rf, "/1/"))
+
+    assert html == LargeNav()._render(request_for(rf, "/1/"))
+    assert renders == ["/1/", "/1/"]
+    # no per node renders to build a splice entry
+    assert len(build_renders) == 1
+    assert any(":path:" in key for key in entries())
+
+
+def test_apply_fragments_overlap():
+    base = "<a></a>"
+
+    assert apply_fragments(base, [(0, 2, 2, " x"), (1, 3, 3, "y")]) == "<a x>y</a>"
+    assert apply_fragments(base, [(0, 2, 2, " x"), (1, 2, 2, " y")]) is None
+    assert apply_fragments(base, [(0, 1, 4, "b"), (1, 3, 5, "c")]) is None
+
+
+def test_render_cache_invalid_mode(rf):
+    class InvalidNav(CachedNav):
+        cache_mode = "everything"
+
+    with pytest.raises(ImproperlyConfigured):
+        InvalidNav().render(request_for(rf))
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    # deferred until the test runs them
+    refreshes = []
+    monkeypatch.setattr(_cache, "refresh_in_background", refreshes.append)
+    return refreshes
+
+
+@override_settings(DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True, "CACHE_STALE_TIMEOUT": 60})
+def test_render_cache_stale_while_revalidate(renders, refreshes, rf):
+    req = request_for(rf)
+    key = stored_key(CachedNav(), req)
+    fresh = CachedNav().render(req)
+    caches["default"].set(key, (time.time() - 1, "stale"), 60)
+
+    assert CachedNav().render(request_for(rf)) == "stale"
+    # only one refresh runs at a time
+    assert CachedNav().render(request_for(rf)) == "stale"
+    assert len(refreshes) == 1
+
+    refreshes[0]()
+
+    assert CachedNav().render(request_for(rf)) == fresh
+    assert renders == ["/", "/"]
+    assert caches["default"].get(f"{key}:lock") is None
+
+
+def test_render_cache_single_flight(rf, monkeypatch):
+    renders = []
+    render = Nav._render
+
+    def slow_render(self, request, template_name=None):
+        renders.append(request.path)
+        time.sleep(0.2)
+        return render(self, request, template_name)
+
+    monkeypatch.setattr(Nav, "_render", slow_render)
+    monkeypatch.setattr(_cache, "LOCK_POLL_INTERVAL", 0.01)
+    results = []
+
+    def worker():
+        results.append(CachedNav().render(request_for(rf)))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert renders == ["/"]
+    assert len(results) == 8
+    assert len(set(results)) == 1
+
+
+def test_refresh_in_background_context(rf):
+    seen = []
+
+    def refresh():
+        seen.append((translation.get_language(), get_script_prefix()))
+
+    set_script_prefix("/prefix/")
+    try:
+        with translation.override("fr"):
+            _cache.refresh_in_background(refresh).join()
+    finally:
+        set_script_prefix("/")
+
+    assert seen == [("fr", "/prefix/")]
+
+
+@override_settings(DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True, "CACHE_LOCK_TIMEOUT": 0})
+def test_render_cache_lock_not_released(renders, rf):
+    key = stored_key(CachedNav(), request_for(rf))
+    caches["default"].add(f"{key}:lock", True, 60)
+
+    CachedNav().render(request_for(rf))
+
+    assert renders == ["/"]
+    assert caches["default"].get(key) is None
+
+
+@override_settings(DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True, "CACHE_LOCK_TIMEOUT": 0})
+def test_render_splice_lock_not_released(renders, rf, monkeypatch):
+    def build_splice(*args):
+        raise AssertionError("waiters shouldn't build the splice")
+
+    monkeypatch.setattr(_cache, "build_splice", build_splice)
+    req = request_for(rf)
+    key = get_cache_key(SpliceNav(), req, splice=True)
+    caches["default"].add(f"{key}:{get_version('default')}:lock", True, 60)
+
+    html = SpliceNav().render(req)
+
+    assert html == SpliceNav()._render(req)
+    assert renders == ["/", "/"]
+
+
+@pytest.fixture
+def shared_gets(monkeypatch):
+    gets = []
+    get = caches["default"].get
+
+    def counting_get(key, default=None, version=None):
+        gets.append(key)
+        return get(key, default, version)
+
+    monkeypatch.setattr(caches["default"], "get", counting_get)
+    return gets
+
+
+@override_settings(
+    DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True, "LOCAL_CACHE_MAX_ENTRIES": 10}
+)
+def test_render_local_cache(renders, shared_gets, rf):
+    first = CachedNav().render(request_for(rf))
+    del shared_gets[:]
+
+    assert CachedNav().render(request_for(rf)) == first
+    assert shared_gets == []
+    assert renders == ["/"]
+    assert get_cache_stats()["default"] | {"bytes": 0} == {
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "entries": 1,
+        "bytes": 0,
+    }
+
+
+@override_settings(
+    DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True, "LOCAL_CACHE_MAX_ENTRIES": 10}
+)
+def test_render_local_cache_filled_from_shared(renders, rf):
+    CachedNav().render(request_for(rf))
+    _cache._local_caches.clear()
+
+    CachedNav().render(request_for(rf))
+    CachedNav().render(request_for(rf))
+
+    assert renders == ["/"]
+    assert get_cache_stats()["default"]["hits"] == 1
+
+
+def test_invalidate_cache(renders, rf):
+    CachedNav().render(request_for(rf))
+    invalidate_cache()
+    CachedNav().render(request_for(rf))
+
+    assert renders == ["/", "/"]
+
+
+@override_settings(
+    DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True, "LOCAL_CACHE_MAX_ENTRIES": 10}
+)
+def test_invalidate_cache_other_process(renders, rf):
+    CachedNav().render(request_for(rf))
+    version = get_version("default")
+    # another process bumps the version
+    caches["default"].incr(VERSION_KEY)
+
+    CachedNav().render(request_for(rf))
+    assert renders == ["/"]
+
+    _cache._versions["default"] = (0, version)
+    CachedNav().render(request_for(rf))
+
+    assert get_version("default") == version + 1
+    assert renders == ["/", "/"]
+
+
+def test_invalidate_cache_alias(rf):
+    version = get_version("navs")
+    invalidate_cache("navs")
+
+    assert get_version("navs") == version + 1
+
+    caches["navs"].clear()
+    invalidate_cache("navs")
+
+    assert get_version("navs") != version + 1
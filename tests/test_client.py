@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import json
+import re
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+
+import django_simple_nav
+from django_simple_nav._cache import get_cache_key
+from django_simple_nav._plan import get_nav_plan
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavGroup
+from django_simple_nav.nav import NavItem
+
+pytestmark = pytest.mark.django_db
+
+
+class ClientNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    active_mode = "client"
+    items = [
+        NavItem(title="Home", url="/"),
+        NavItem(title="Search", url="/search/?b=2&a=1", match_query="subset"),
+        NavGroup(
+            title="Docs",
+            items=[
+                NavItem(title="Guides", url="/docs/guides", match="prefix"),
+                NavItem(title="API", url="/docs/api/", active_patterns=[r"^/api/"]),
+            ],
+        ),
+        NavItem(title="Example", url="https://example.com/"),
+    ]
+
+
+ACTIVE_JS = (
+    Path(django_simple_nav.__file__).parent
+    / "static"
+    / "django_simple_nav"
+    / "active.js"
+)
+
+# just enough of the DOM for active.js, reporting which elements it marks
+DOM_STUB = """
+const elements = %s.map((dataset) => ({
+  dataset,
+  active: false,
+  classList: { add() {}, remove() {} },
+  setAttribute() { this.active = true; },
+  removeAttribute() { this.active = false; },
+}));
+global.document = {
+  currentScript: null,
+  readyState: "complete",
+  querySelectorAll(selector) {
+    const node = /data-nav-node="(.*)"/.exec(selector);
+    return node ? elements.filter((el) => el.dataset.navNode === node[1]) : elements;
+  },
+};
+global.window = { location: %s, addEventListener() {} };
+"""
+
+
+def run_active_js(items, location):
+    datasets = [
+        {
+            re.sub(r"-(\w)", lambda m: m[1].upper(), name[len("data-") :]): value
+            for name, value in attrs(item["match_attrs"]).items()
+        }
+        for item in items
+    ]
+    source = (
+        DOM_STUB % (json.dumps(datasets), json.dumps(location))
+        + ACTIVE_JS.read_text()
+        + "console.log(JSON.stringify(elements.map((el) => el.active)));"
+    )
+    result = subprocess.run(
+        ["node", "-"], input=source, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def request_for(rf, path="/"):
+    req = rf.get(path)
+    req.user = AnonymousUser()
+    return req
+
+
+def attrs(html):
+    return dict(re.findall(r'(data-nav-[\w-]+)="([^"]*)"', str(html)))
+
+
+def flatten(items):
+    return [item for item in items for item in [item, *flatten(item["items"] or [])]]
+
+
+def test_client_match_attrs(rf):
+    items = flatten(ClientNav().get_context_data(request_for(rf))["items"])
+    home, search, docs, guides, api, example = (
+        attrs(item["match_attrs"]) for item in items
+    )
+
+    assert not any(item["active"] for item in items)
+    assert home == {
+        "data-nav-node": home["data-nav-node"],
+        "data-nav-match": "exact",
+        "data-nav-path": "/",
+        "data-nav-append-slash": "true",
+        "data-nav-query-mode": "exact",
+    }
+    assert search["data-nav-query"] == "a=1&amp;b=2"
+    assert search["data-nav-query-mode"] == "subset"
+    assert "data-nav-match" not in docs
+    assert guides["data-nav-parent"] == docs["data-nav-node"]
+    assert guides["data-nav-match"] == "prefix"
+    assert guides["data-nav-path"] == "/docs/guides/"
+    assert api["data-nav-patterns"] == "[&quot;^/api/&quot;]"
+    assert example["data-nav-scheme"] == "https"
+    assert example["data-nav-host"] == "example.com"
+
+
+@override_settings(APPEND_SLASH=False)
+def test_client_match_attrs_no_append_slash(rf):
+    items = ClientNav().get_context_data(request_for(rf))["items"]
+
+    assert "data-nav-append-slash" not in attrs(items[0]["match_attrs"])
+
+
+def test_client_match_attrs_query_keys(rf):
+    class KeysNav(ClientNav):
+        match_query = ["page", "tab"]
+        items = [NavItem(title="Home", url="/?tab=1&other=2")]
+
+    items = KeysNav().get_context_data(request_for(rf))["items"]
+
+    assert attrs(items[0]["match_attrs"]) | {"data-nav-node": ...} == {
+        "data-nav-node": ...,
+        "data-nav-match": "exact",
+        "data-nav-path": "/",
+        "data-nav-append-slash": "true",
+        "data-nav-query-mode": "keys",
+        "data-nav-query-keys": "page tab",
+        "data-nav-query": "other=2&amp;tab=1",
+    }
+
+
+def test_client_without_plan(rf):
+    nav = Nav(template_name=ClientNav.template_name, items=ClientNav.items)
+    object.__setattr__(nav, "active_mode", "client")
+    assert get_nav_plan(nav) is None
+
+    compiled = flatten(ClientNav().get_context_data(request_for(rf))["items"])
+    evaluated = flatten(nav.get_context_data(request_for(rf))["items"])
+
+    ids = {}
+    for compiled_item, item in zip(compiled, evaluated, strict=True):
+        compiled_attrs = attrs(compiled_item["match_attrs"])
+        item_attrs = attrs(item["match_attrs"])
+        ids[item_attrs.pop("data-nav-node")] = compiled_attrs.pop("data-nav-node")
+        if "data-nav-parent" in item_attrs:
+            item_attrs["data-nav-parent"] = ids[item_attrs["data-nav-parent"]]
+        assert item_attrs == compiled_attrs
+        assert item["active"] is False
+
+
+def test_client_skips_get_active(rf, monkeypatch):
+    def get_active(self, request):
+        raise AssertionError
+
+    monkeypatch.setattr(NavItem, "get_active", get_active)
+    nav = Nav(template_name=ClientNav.template_name, items=ClientNav.items)
+    object.__setattr__(nav, "active_mode", "client")
+
+    nav.render(request_for(rf, "/docs/guides/"))
+    ClientNav().render(request_for(rf, "/docs/guides/"))
+
+
+def test_client_node_ids_unique_per_nav(rf):
+    class OtherNav(ClientNav):
+        items = [NavItem(title="Other", url="/other/")]
+
+    first = attrs(
+        ClientNav().get_context_data(request_for(rf))["items"][0]["match_attrs"]
+    )
+    other = attrs(
+        OtherNav().get_context_data(request_for(rf))["items"][0]["match_attrs"]
+    )
+
+    assert first["data-nav-node"] != other["data-nav-node"]
+
+
+def test_client_builtin_templates(rf):
+    item = ClientNav().get_context_data(request_for(rf))["items"][0]
+
+    assert 'data-nav-path="/"' in str(item)
+
+
+def test_client_cache_key_ignores_path(rf):
+    assert get_cache_key(ClientNav(), request_for(rf, "/")) == get_cache_key(
+        ClientNav(), request_for(rf, "/docs/guides/?a=1")
+    )
+
+
+def test_client_invalid_active_mode(rf):
+    class InvalidNav(ClientNav):
+        active_mode = "browser"
+
+    with pytest.raises(ImproperlyConfigured):
+        InvalidNav().get_context_data(request_for(rf))
+
+
+def test_client_script_shipped():
+    assert "data-nav-node" in ACTIVE_JS.read_text()
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="requires Node.js")
+@pytest.mark.parametrize("path", ["/caf%C3%A9/", "/docs/guides/", "/search/"])
+def test_client_script_matches_server(path, rf):
+    class EncodedNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [
+            NavItem(title="Home", url="/"),
+            NavItem(title="Encoded", url="/caf%C3%A9/"),
+            NavItem(title="Unencoded", url="/café/"),
+            NavItem(title="Guides", url="/docs/guides", match="prefix"),
+            NavItem(title="Search", url="/search/?a=1", match_query="ignore"),
+        ]
+
+    class ClientEncodedNav(EncodedNav):
+        active_mode = "client"
+
+    server = EncodedNav().get_context_data(request_for(rf, path))["items"]
+    client = ClientEncodedNav().get_context_data(request_for(rf, path))["items"]
+    location = {
+        "protocol": "http:",
+        "host": "testserver",
+        "pathname": path,
+        "search": "",
+    }
+
+    assert run_active_js(client, location) == [item["active"] for item in server]
+    assert any(item["active"] for item in server)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import linecache
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import override_settings
+from django.utils.translation import gettext_lazy
+from model_bakery import baker
+
+from django_simple_nav._codegen import generate_build
+from django_simple_nav._plan import get_nav_plan
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavGroup
+from django_simple_nav.nav import NavItem
+from tests.navs import DummyNav
+
+pytestmark = pytest.mark.django_db
+
+
+class CodegenNav(Nav):
+    template_name = "tests/self_render_nav.html"
+    codegen = True
+    items = [
+        NavItem(title="Home", url="/"),
+        NavItem(title="<b>Search</b>", url="/search/?q=a&b=<c>"),
+        NavItem(title=gettext_lazy("Lazy"), url="/lazy/"),
+        NavItem(title="Dynamic", url=lambda: "/dynamic/"),
+        NavItem(title="Extra", url="/extra/", extra_context={"foo": "bar"}),
+        NavItem(
+            title="Custom",
+            url="/custom/",
+            template_name="tests/processor_navitem.html",
+        ),
+        NavGroup(
+            title="Docs",
+            url="/docs/",
+            items=[
+                NavItem(title="Guides", url="/docs/guides/"),
+                NavItem(title="Staff", url="/docs/staff/", permissions=["is_staff"]),
+                NavGroup(title="Empty", items=[]),
+            ],
+        ),
+        NavGroup(
+            title="Admin",
+            permissions=["is_superuser"],
+            items=[NavItem(title="Users", url="/admin/users/")],
+        ),
+    ]
+
+
+def without_codegen(nav_class):
+    return type(nav_class.__name__, (nav_class,), {"codegen": False})
+
+
+def request_for(rf, path="/", **user_kwargs):
+    req = rf.get(path)
+    req.user = (
+        baker.make(get_user_model(), **user_kwargs) if user_kwargs else AnonymousUser()
+    )
+    return req
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["/", "/search/?b=<c>&q=a", "/dynamic/", "/docs/guides/", "/admin/users/"],
+)
+@pytest.mark.parametrize(
+    "user_kwargs",
+    [{}, {"is_staff": True}, {"is_superuser": True}],
+)
+def test_codegen_matches_build(path, user_kwargs, rf):
+    req = request_for(rf, path, **user_kwargs)
+
+    generated = CodegenNav().get_context_data(req)
+    built = without_codegen(CodegenNav)().get_context_data(req)
+
+    assert generated == built
+    assert CodegenNav().render(req) == without_codegen(CodegenNav)().render(req)
+
+
+@pytest.mark.parametrize("user_kwargs", [{}, {"is_staff": True}])
+def test_codegen_matches_build_dummy_nav(user_kwargs, rf):
+    req = request_for(rf, "/group/", **user_kwargs)
+    codegen_nav = type("DummyCodegenNav", (DummyNav,), {"codegen": True})
+
+    assert codegen_nav().get_context_data(req) == DummyNav().get_context_data(req)
+
+
+def test_codegen_build_function_cached(rf, monkeypatch):
+    calls = []
+
+    def counting_generate_build(plan, table):
+        calls.append(plan)
+        return generate_build(plan, table)
+
+    monkeypatch.setattr(
+        "django_simple_nav._plan.generate_build", counting_generate_build
+    )
+
+    class CachedNav(CodegenNav):
+        pass
+
+    CachedNav().render(request_for(rf))
+    CachedNav().render(request_for(rf, "/docs/guides/"))
+
+    assert len(calls) == 1
+
+
+def test_codegen_prerendered(rf):
+    items = CodegenNav().get_context_data(request_for(rf, is_superuser=True))["items"]
+    home, search, lazy, dynamic, extra, custom, docs, admin = items
+
+    assert home._prerendered == '\n  <a href="/" aria-current="page">Home</a>\n\n'
+    assert search._prerendered == (
+        '\n  <a href="/search/?q=a&amp;b=&lt;c&gt;"><b>Search</b></a>\n\n'
+    )
+    assert extra._prerendered is not None
+    # rendered per request: lazy titles, callable URLs, other templates, groups
+    assert lazy._prerendered is None
+    assert dynamic._prerendered is None
+    assert custom._prerendered is None
+    assert docs._prerendered is None
+    assert admin._prerendered is None
+
+
+def test_codegen_prerendered_skipped_without_native_renderer(rf, monkeypatch):
+    monkeypatch.setattr("django_simple_nav.nav.get_native_renderer", lambda *args: None)
+    req = request_for(rf)
+
+    assert CodegenNav().render(req) == without_codegen(CodegenNav)().render(req)
+
+
+def test_codegen_client_mode(rf):
+    class ClientCodegenNav(CodegenNav):
+        active_mode = "client"
+
+    req = request_for(rf)
+    item = ClientCodegenNav().get_context_data(req)["items"][0]
+
+    assert "data-nav-node" in str(item)
+    assert item._prerendered is None
+
+
+@override_settings(APPEND_SLASH=False)
+def test_codegen_follows_url_table(rf):
+    class SlashNav(Nav):
+        template_name = "tests/self_render_nav.html"
+        codegen = True
+        items = [NavItem(title="Item", url="/item")]
+
+    assert SlashNav().get_context_data(request_for(rf))["items"][0]["url"] == "/item"
+
+    with override_settings(APPEND_SLASH=True):
+        item = SlashNav().get_context_data(request_for(rf))["items"][0]
+
+    assert item["url"] == "/item/"
+
+
+def test_codegen_source_in_linecache():
+    plan = get_nav_plan(CodegenNav())
+    build = generate_build(plan, plan.get_url_table())
+    filename = build.__code__.co_filename
+
+    assert "def build(request" in "".join(linecache.getlines(filename))
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import pytest
+from django.conf import settings
+from django.test import override_settings
 
 from django_simple_nav.conf import app_settings
 
@@ -9,3 +11,24 @@ def test_app_settings():
     # stub test until `django-simple-nav` requires custom app settings
     with pytest.raises(AttributeError):
         assert app_settings.foo
+
+
+def test_app_settings_resolved_once(monkeypatch):
+    with override_settings(DJANGO_SIMPLE_NAV={"CACHE_TIMEOUT": 60}):
+        assert app_settings.CACHE_TIMEOUT == 60
+
+        # a change that doesn't go through `setting_changed` is not seen
+        with monkeypatch.context() as m:
+            m.setattr(settings, "DJANGO_SIMPLE_NAV", {"CACHE_TIMEOUT": 30})
+            assert app_settings.CACHE_TIMEOUT == 60
+
+    assert app_settings.CACHE_TIMEOUT == 300
+
+
+def test_app_settings_reresolved_on_setting_changed():
+    assert app_settings.CACHE_TIMEOUT == 300
+
+    with override_settings(DJANGO_SIMPLE_NAV={"CACHE_TIMEOUT": 60}):
+        assert app_settings.CACHE_TIMEOUT == 60
+
+    assert app_settings.CACHE_TIMEOUT == 300
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from collections import Counter
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+
+from django_simple_nav._evaluator import evaluation
+from django_simple_nav._evaluator import get_current_evaluator
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavGroup
+from django_simple_nav.nav import NavItem
+
+pytestmark = pytest.mark.django_db
+
+CALLS: Counter[str] = Counter()
+
+
+class CountingMixin:
+    def get_url(self):
+        CALLS["get_url"] += 1
+        return super().get_url()
+
+    def get_active(self, request):
+        CALLS["get_active"] += 1
+        return super().get_active(request)
+
+    def check_permissions(self, request):
+        CALLS["check_permissions"] += 1
+        return super().check_permissions(request)
+
+    def get_items(self, request):
+        CALLS["get_items"] += 1
+        return super().get_items(request)
+
+    def get_context_data(self, request):
+        CALLS["get_context_data"] += 1
+        return super().get_context_data(request)
+
+
+class CountingNavItem(CountingMixin, NavItem):
+    pass
+
+
+class CountingNavGroup(CountingMixin, NavGroup):
+    pass
+
+
+def build_tree(depth, breadth):
+    if depth == 0:
+        return [CountingNavItem(title="Leaf", url="/leaf/") for _ in range(breadth)]
+    return [
+        CountingNavGroup(title="Group", items=build_tree(depth - 1, breadth))
+        for _ in range(breadth)
+    ]
+
+
+def count_nodes(items):
+    return sum(1 + count_nodes(getattr(item, "items", [])) for item in items)
+
+
+@pytest.mark.parametrize(
+    "depth,breadth",
+    [
+        (0, 1),
+        (1, 3),
+        (3, 2),
+        (6, 2),
+    ],
+)
+def test_evaluation_is_linear(depth, breadth, req):
+    nav = Nav(template_name="tests/dummy_nav.html", items=build_tree(depth, breadth))
+    num_nodes = count_nodes(nav.items)
+
+    req.user = AnonymousUser()
+    CALLS.clear()
+
+    nav.get_context_data(req)
+
+    assert CALLS == {
+        "get_url": num_nodes,
+        "get_active": num_nodes,
+        "check_permissions": num_nodes,
+        "get_items": num_nodes,
+        "get_context_data": num_nodes,
+    }
+
+
+def test_evaluation_memoizes_overridden_get_items(req):
+    class RewritingNavGroup(NavGroup):
+        def get_items(self, request):
+            return [NavItem(title=item.title, url="/rewritten/") for item in self.items]
+
+    group = RewritingNavGroup(title="Group", items=[NavItem(title="Child", url="/")])
+
+    context = Nav(template_name=..., items=[group]).get_context_data(req)
+
+    assert context["items"][0]["items"][0]["url"] == "/rewritten/"
+
+
+def test_evaluation_reused_for_same_request(req):
+    with evaluation(req) as outer:
+        with evaluation(req) as inner:
+            assert inner is outer
+
+
+def test_evaluation_new_for_different_request(req, rf):
+    with evaluation(req) as outer:
+        with evaluation(rf.get("/")) as inner:
+            assert inner is not outer
+            assert get_current_evaluator() is inner
+        assert get_current_evaluator() is outer
+
+
+def test_evaluation_reset_after_exit(req):
+    with evaluation(req):
+        pass
+
+    assert get_current_evaluator() is None
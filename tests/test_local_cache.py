@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import time
+
+from django.test import override_settings
+
+from django_simple_nav._local_cache import LocalCache
+from django_simple_nav._local_cache import _local_caches
+from django_simple_nav._local_cache import get_local_cache
+
+
+def test_local_cache_get_set():
+    local = LocalCache(max_entries=10, max_bytes=10_000)
+    local.set("a", "html", 60)
+
+    assert local.get("a") == "html"
+    assert local.get("b") is None
+    assert local.stats() | {"bytes": 0} == {
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "entries": 1,
+        "bytes": 0,
+    }
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(max_entries=2, max_bytes=10_000)
+    local.set("a", "1", 60)
+    local.set("b", "2", 60)
+    local.get("a")
+    local.set("c", "3", 60)
+
+    assert local.get("b") is None
+    assert local.get("a") == "1"
+    assert local.get("c") == "3"
+    assert local.evictions == 1
+
+
+def test_local_cache_max_bytes():
+    value = "x" * 1000
+    local = LocalCache(max_entries=100, max_bytes=2500)
+    for key in "abc":
+        local.set(key, value, 60)
+
+    assert local.stats()["entries"] == 2
+    assert local.size <= 2500
+    assert local.evictions == 1
+
+    local.set("big", "x" * 5000, 60)
+
+    assert local.get("big") is None
+    assert local.stats()["entries"] == 2
+
+
+def test_local_cache_size_of_tuples():
+    local = LocalCache(max_entries=100, max_bytes=100_000)
+    local.set("a", (None, ("x" * 1000, ())), 60)
+
+    assert local.size > 1000
+
+
+def test_local_cache_timeout(monkeypatch):
+    now = time.monotonic()
+    local = LocalCache(max_entries=10, max_bytes=10_000)
+    local.set("a", "html", 10)
+    local.set("expired", "html", 0)
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+
+    assert local.get("a") is None
+    assert local.get("expired") is None
+    assert local.stats()["entries"] == 0
+    assert local.size == 0
+
+
+def test_local_cache_replace_and_clear():
+    local = LocalCache(max_entries=10, max_bytes=10_000)
+    local.set("a", "1", 60)
+    local.set("a", "22", 60)
+
+    assert local.get("a") == "22"
+    assert local.stats()["entries"] == 1
+
+    local.clear()
+
+    assert local.get("a") is None
+    assert local.size == 0
+
+
+def test_get_local_cache():
+    _local_caches.clear()
+
+    assert get_local_cache("default") is None
+
+    with override_settings(DJANGO_SIMPLE_NAV={"LOCAL_CACHE_MAX_ENTRIES": 5}):
+        local = get_local_cache("default")
+        assert local is get_local_cache("default")
+        assert local.max_entries == 5
+
+    with override_settings(DJANGO_SIMPLE_NAV={"LOCAL_CACHE_MAX_ENTRIES": 6}):
+        assert get_local_cache("default") is not local
+
+    _local_caches.clear()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import itertools
+
+import pytest
+from django.template import engines
+from django.test import override_settings
+from django.utils.safestring import mark_safe
+
+from django_simple_nav import _native
+from django_simple_nav._native import get_native_renderer
+from django_simple_nav._native import render_navgroup
+from django_simple_nav._native import render_navitem
+from django_simple_nav._templates import get_template_engine
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavGroup
+from django_simple_nav.nav import NavItem
+from django_simple_nav.nav import NavItemContext
+from tests.test_templates import PROCESSOR_TEMPLATES
+
+URLS = ["", "/", "/search/?q=a&b=<c>", mark_safe("/safe/?a=1&b=2")]
+TITLES = ["Home", "<b>Bold</b> & co", mark_safe("<b>Safe</b>")]
+ACTIVE = [True, False]
+MATCH_ATTRS = [None, "", mark_safe(' data-nav-node="a-0"'), ' data-x="<y>"']
+ITEMS = [
+    None,
+    [],
+    ["<li>", mark_safe("<em>safe</em>")],
+    [{"title": "<dict>"}, NavItemContext({"title": "Child", "url": "/c/"})],
+]
+
+
+def real_render(template_name, context):
+    engine = engines["django"]
+    return engine.get_template(template_name).render(context)
+
+
+def contexts(with_items):
+    for url, title, active, match_attrs in itertools.product(
+        URLS, TITLES, ACTIVE, MATCH_ATTRS
+    ):
+        context = {"url": url, "title": title, "active": active}
+        if match_attrs is not None:
+            context["match_attrs"] = match_attrs
+        if not with_items:
+            yield context
+            continue
+        for items in ITEMS:
+            yield {**context, "items": items}
+
+
+@pytest.mark.parametrize("context", list(contexts(with_items=False)))
+def test_navitem_parity(context):
+    assert render_navitem(context) == real_render(
+        "django_simple_nav/navitem.html", context
+    )
+
+
+@pytest.mark.parametrize("context", list(contexts(with_items=True)))
+def test_navgroup_parity(context):
+    assert render_navgroup(context) == real_render(
+        "django_simple_nav/navgroup.html", context
+    )
+
+
+@pytest.mark.parametrize(
+    "context",
+    [
+        {"url": 1, "title": "Home"},
+        {"url": "/", "title": lambda: "Home"},
+        {"url": "/", "title": "Home", "match_attrs": ["data-x"]},
+    ],
+)
+def test_native_unsupported_values(context):
+    assert render_navitem(context) is None
+    assert render_navgroup({**context, "items": ("a",)}) is None
+
+
+def test_get_native_renderer(rf):
+    engine = get_template_engine()
+    req = rf.get("/")
+
+    assert (
+        get_native_renderer(engine, "django_simple_nav/navitem.html", req)
+        is render_navitem
+    )
+    assert (
+        get_native_renderer(engine, "django_simple_nav/navgroup.html", req)
+        is render_navgroup
+    )
+    assert get_native_renderer(engine, "tests/custom_navitem.html", req) is None
+
+
+def test_get_native_renderer_overridden_template(rf, tmp_path):
+    (tmp_path / "django_simple_nav").mkdir()
+    (tmp_path / "django_simple_nav" / "navitem.html").write_text("{{ title }}")
+
+    with override_settings(
+        TEMPLATES=[
+            {
+                "BACKEND": "django.template.backends.django.DjangoTemplates",
+                "APP_DIRS": True,
+                "DIRS": [tmp_path],
+            }
+        ]
+    ):
+        engine = get_template_engine()
+        renderer = get_native_renderer(
+            engine, "django_simple_nav/navitem.html", rf.get("/")
+        )
+        html = str(
+            NavItemContext(
+                {"title": "Home", "url": "/"},
+                nav_item=NavItem(title="Home", url="/"),
+                request=rf.get("/"),
+            )
+        )
+
+    assert renderer is None
+    assert html == "Home"
+
+
+@override_settings(
+    TEMPLATES=[
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "APP_DIRS": True,
+            "OPTIONS": {"autoescape": False},
+        }
+    ]
+)
+def test_get_native_renderer_autoescape_off(rf):
+    engine = get_template_engine()
+
+    assert (
+        get_native_renderer(engine, "django_simple_nav/navitem.html", rf.get("/"))
+        is None
+    )
+
+
+@override_settings(
+    TEMPLATES=[
+        {
+            **PROCESSOR_TEMPLATES[0],
+            "OPTIONS": {"context_processors": ["tests.test_native.title_processor"]},
+        }
+    ]
+)
+def test_get_native_renderer_shadowed_variable(rf):
+    engine = get_template_engine()
+
+    assert (
+        get_native_renderer(engine, "django_simple_nav/navitem.html", rf.get("/"))
+        is None
+    )
+
+
+def title_processor(request):
+    return {"title": "From processor"}
+
+
+class BuiltinNav(Nav):
+    template_name = "tests/self_render_nav.html"
+    items = [
+        NavItem(title="Home", url="/"),
+        NavItem(title="<About>", url="/about/?a=1&b=2"),
+        NavGroup(
+            title="Group",
+            items=[
+                NavItem(title="Child", url="/child/"),
+                NavGroup(title="Nested", items=[NavItem(title="Leaf", url="/leaf/")]),
+            ],
+        ),
+        NavGroup(title="Linked", url="/linked/", items=[]),
+    ]
+
+
+@pytest.mark.parametrize("path", ["/", "/child/", "/leaf/"])
+def test_native_nav_parity(path, rf, monkeypatch):
+    native = BuiltinNav().render(rf.get(path))
+    monkeypatch.setattr(_native, "NATIVE_RENDERERS", {})
+
+    assert native == BuiltinNav().render(rf.get(path))
+    assert 'aria-current="page"' in native
@@ -6,10 +6,12 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ImproperlyConfigured
 from django.test import override_settings
+from django.urls import resolve
 from django.urls import reverse
 from django.urls import reverse_lazy
 from model_bakery import baker
 
+from django_simple_nav.nav import Nav
 from django_simple_nav.nav import NavItem
 
 pytestmark = pytest.mark.django_db
@@ -142,6 +144,26 @@ def test_active_append_slash_item(append_slash_item, expected, rf):
         assert item.get_active(req) is expected
 
 
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("/test", "/test/"),
+        ("https://example.com/test", "https://example.com/test/"),
+        ("?query=param", "/?query=param"),
+    ],
+)
+def test_get_url_literal_not_reversed(url, expected, monkeypatch):
+    def fail_reverse(*args, **kwargs):
+        raise AssertionError("literal URLs should not be reversed")
+
+    monkeypatch.setattr("django_simple_nav._urls.reverse", fail_reverse)
+
+    item = NavItem(title=..., url=url)
+
+    with override_settings(APPEND_SLASH=True):
+        assert item.get_url() == expected
+
+
 def test_get_url_improperly_configured():
     item = NavItem(title=..., url=None)
 
@@ -159,6 +181,18 @@ def test_get_url_override():
     assert item.get_url() == "/"
 
 
+def test_subclass_post_init(rf):
+    class PostInitNavItem(NavItem):
+        def __post_init__(self):
+            object.__setattr__(self, "title", self.title.upper())
+
+    item = PostInitNavItem(title="Test", url="/test/")
+
+    assert item.get_url() == "/test/"
+    assert item.get_active(rf.get("/test/"))
+    assert item.title == "TEST"
+
+
 @pytest.mark.parametrize(
     "url,req_path,req_params,expected",
     [
@@ -230,6 +264,169 @@ def test_active_reverse_no_match(req):
     assert item.get_active(req) is False
 
 
+@pytest.mark.parametrize(
+    "match,req_path,expected",
+    [
+        ("prefix", "/blog/", True),
+        ("prefix", "/blog", True),
+        ("prefix", "/blog/2024/post/", True),
+        ("prefix", "/blog/?page=2", True),
+        ("prefix", "/blogroll/", False),
+        ("prefix", "/", False),
+        ("longest_prefix", "/blog/2024/post/", True),
+        ("exact", "/blog/2024/post/", False),
+    ],
+)
+def test_active_match(match, req_path, expected, rf):
+    item = NavItem(title=..., url="/blog/", match=match)
+
+    req = rf.get(req_path)
+
+    assert item.get_active(req) == expected
+
+
+def test_active_match_prefix_root(rf):
+    item = NavItem(title=..., url="/", match="prefix")
+
+    req = rf.get("/anything/")
+
+    assert item.get_active(req) is True
+
+
+def test_active_match_prefix_different_domain(rf):
+    item = NavItem(title=..., url="http://different-domain/blog/", match="prefix")
+
+    req = rf.get("/blog/post/")
+
+    assert item.get_active(req) is False
+
+
+def test_match_invalid():
+    with pytest.raises(ImproperlyConfigured):
+        NavItem(title=..., url="/", match="startswith")
+
+
+@pytest.mark.parametrize(
+    "active_patterns,req_path,expected",
+    [
+        ([r"^/orders/\d+/"], "/orders/42/", True),
+        ([r"^/orders/\d+/"], "/orders/42/items/", True),
+        ([r"^/orders/\d+/"], "/orders/new/", False),
+        ([r"^/orders/new/$", r"^/orders/\d+/"], "/orders/new/", True),
+        ([r"/edit/$"], "/orders/42/edit/", True),
+        ([], "/orders/42/", False),
+    ],
+)
+def test_active_patterns(active_patterns, req_path, expected, rf):
+    item = NavItem(title=..., url="/orders/", active_patterns=active_patterns)
+
+    req = rf.get(req_path)
+
+    assert item.get_active(req) == expected
+
+
+def test_active_patterns_without_url(rf):
+    item = NavItem(title=..., active_patterns=[r"^/orders/"])
+
+    req = rf.get("/orders/42/")
+
+    assert item.get_active(req) is True
+
+
+def test_active_patterns_invalid():
+    with pytest.raises(ImproperlyConfigured):
+        NavItem(title=..., url="/", active_patterns=["^/orders/("])
+
+
+@pytest.mark.parametrize(
+    "url,req_path,expected",
+    [
+        ("fake-view", "/fake-view/", True),
+        ("fake-view", "/fake-view/?page=2", True),
+        # the resolved view is used even if the path was rewritten, e.g. by
+        # an i18n prefix
+        ("fake-view", "/en/fake-view/", True),
+        ("home", "/fake-view/", False),
+    ],
+)
+def test_active_match_view(url, req_path, expected, rf):
+    item = NavItem(title=..., url=url, match="view")
+
+    req = rf.get(req_path)
+    req.resolver_match = resolve("/fake-view/")
+
+    assert item.get_active(req) == expected
+
+
+@pytest.mark.parametrize(
+    "req_path,expected",
+    [
+        ("/fake-view/", True),
+        ("/fake-view/?page=2", False),
+        ("/", False),
+    ],
+)
+def test_active_match_view_unresolved_request(req_path, expected, rf):
+    item = NavItem(title=..., url="fake-view", match="view")
+
+    req = rf.get(req_path)
+
+    assert item.get_active(req) == expected
+
+
+@pytest.mark.parametrize("url", ["/fake-view/", None, lambda: "/fake-view/"])
+def test_match_view_requires_url_name(url):
+    with pytest.raises(ImproperlyConfigured):
+        NavItem(title=..., url=url, match="view")
+
+
+@pytest.mark.parametrize(
+    "match_query,req_params,expected",
+    [
+        ("exact", {"tab": "open"}, True),
+        ("exact", {"tab": "open", "page": "2"}, False),
+        ("ignore", {"tab": "closed"}, True),
+        ("ignore", None, True),
+        ("subset", {"tab": "open", "page": "2"}, True),
+        ("subset", {"tab": "closed"}, False),
+        ("subset", None, False),
+        (["tab"], {"tab": "open", "utm_source": "mail"}, True),
+        (["tab"], {"tab": "closed"}, False),
+        (["page"], {"tab": "closed"}, True),
+    ],
+)
+def test_active_match_query(match_query, req_params, expected, rf):
+    item = NavItem(title=..., url="/list/?tab=open", match_query=match_query)
+
+    req = rf.get("/list/", req_params)
+
+    assert item.get_active(req) == expected
+
+
+def test_active_match_query_nav_default(rf):
+    item = NavItem(title=..., url="/list/?tab=open")
+    own_policy = NavItem(title=..., url="/list/?tab=open", match_query="exact")
+    nav = Nav(
+        template_name="tests/dummy_nav.html",
+        items=[item, own_policy],
+        match_query="ignore",
+    )
+
+    req = rf.get("/list/")
+    req.user = AnonymousUser()
+
+    items = nav.get_context_data(req)["items"]
+
+    assert [item["active"] for item in items] == [True, False]
+    assert item.get_active(req) is False
+
+
+@pytest.mark.parametrize("match_query", ["loose", [1], {"q": "x"}])
+def test_match_query_invalid(match_query):
+    with pytest.raises(ImproperlyConfigured):
+        NavItem(title=..., url="/", match_query=match_query)
+
+
 def test_get_items(req):
     item = NavItem(title=..., url=...)
 
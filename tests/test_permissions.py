@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.test import override_settings
+from model_bakery import baker
+
+from django_simple_nav._permissions import get_user_permissions
+from django_simple_nav._permissions import user_has_perm
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavGroup
+from django_simple_nav.nav import NavItem
+
+pytestmark = pytest.mark.django_db
+
+
+class HasPermOnlyBackend:
+    def authenticate(self, request, **kwargs):
+        return None
+
+    def has_perm(self, user_obj, perm, obj=None):
+        return perm == "tests.backend_perm"
+
+
+class BaseHasPermOnlyBackend(BaseBackend):
+    def has_perm(self, user_obj, perm, obj=None):
+        return perm == "tests.backend_perm"
+
+
+class ExtraPermModelBackend(ModelBackend):
+    def has_perm(self, user_obj, perm, obj=None):
+        return perm == "tests.backend_perm" or super().has_perm(user_obj, perm, obj)
+
+
+class VetoModelBackend(ModelBackend):
+    def has_perm(self, user_obj, perm, obj=None):
+        if perm == "tests.dummy_perm":
+            raise PermissionDenied
+        return super().has_perm(user_obj, perm, obj)
+
+
+batched = override_settings(DJANGO_SIMPLE_NAV={"BATCH_PERMISSIONS": True})
+
+
+class PermissionNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    items = [
+        NavItem(title="One", url="/one/", permissions=["tests.dummy_perm"]),
+        NavGroup(
+            title="Group",
+            items=[
+                NavItem(title="Two", url="/two/", permissions=["tests.dummy_perm"]),
+                NavItem(title="Three", url="/three/", permissions=["tests.other"]),
+            ],
+        ),
+    ]
+
+
+@pytest.fixture
+def user():
+    dummy_perm = baker.make(
+        "auth.Permission",
+        codename="dummy_perm",
+        content_type=baker.make("contenttypes.ContentType", app_label="tests"),
+    )
+    user = baker.make(get_user_model())
+    user.user_permissions.add(dummy_perm)
+    return user
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    user_model = get_user_model()
+    get_all_permissions = user_model.get_all_permissions
+    has_perm = user_model.has_perm
+
+    def counting_get_all_permissions(self, obj=None):
+        calls.append("get_all_permissions")
+        return get_all_permissions(self, obj)
+
+    def counting_has_perm(self, perm, obj=None):
+        calls.append("has_perm")
+        return has_perm(self, perm, obj)
+
+    monkeypatch.setattr(user_model, "get_all_permissions", counting_get_all_permissions)
+    monkeypatch.setattr(user_model, "has_perm", counting_has_perm)
+    return calls
+
+
+def titles(items):
+    return [
+        title
+        for item in items
+        for title in [item["title"], *titles(item["items"] or [])]
+    ]
+
+
+@batched
+@pytest.mark.parametrize("compiled", [True, False])
+def test_permissions_fetched_once(compiled, user, calls, rf):
+    nav = (
+        PermissionNav()
+        if compiled
+        else Nav(template_name="tests/dummy_nav.html", items=PermissionNav.items)
+    )
+    req = rf.get("/")
+    req.user = user
+
+    items = nav.get_context_data(req)["items"]
+    NavItem(title=..., url="/", permissions=["tests.other"]).check_permissions(req)
+
+    assert titles(items) == ["One", "Group", "Two"]
+    assert calls == ["get_all_permissions"]
+
+
+@batched
+def test_permissions_refetched_for_different_user(user, rf):
+    req = rf.get("/")
+    req.user = user
+
+    assert get_user_permissions(req) == {"tests.dummy_perm"}
+
+    req.user = baker.make(get_user_model())
+
+    assert get_user_permissions(req) == frozenset()
+
+
+def test_permissions_batching_disabled(user, calls, rf):
+    req = rf.get("/")
+    req.user = user
+
+    items = PermissionNav().get_context_data(req)["items"]
+
+    assert get_user_permissions(req) is None
+    assert titles(items) == ["One", "Group", "Two"]
+    assert "get_all_permissions" not in calls
+
+
+@batched
+@override_settings(
+    AUTHENTICATION_BACKENDS=[
+        "django.contrib.auth.backends.ModelBackend",
+        "tests.test_permissions.HasPermOnlyBackend",
+    ]
+)
+def test_permissions_backend_without_get_all_permissions(user, rf):
+    req = rf.get("/")
+    req.user = user
+
+    assert get_user_permissions(req) is None
+    assert user_has_perm(req, "tests.backend_perm") is True
+    assert user_has_perm(req, "tests.dummy_perm") is True
+    assert user_has_perm(req, "tests.other") is False
+
+
+@batched
+@override_settings(
+    AUTHENTICATION_BACKENDS=[
+        "django.contrib.auth.backends.ModelBackend",
+        "tests.test_permissions.BaseHasPermOnlyBackend",
+    ]
+)
+def test_permissions_base_backend_without_get_all_permissions(user, rf):
+    class BackendNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Backend", url="/", permissions=["tests.backend_perm"])]
+
+    req = rf.get("/")
+    req.user = user
+
+    assert get_user_permissions(req) is None
+    assert titles(BackendNav().get_context_data(req)["items"]) == ["Backend"]
+
+
+@batched
+@override_settings(
+    AUTHENTICATION_BACKENDS=["tests.test_permissions.ExtraPermModelBackend"]
+)
+def test_permissions_subclass_overriding_has_perm(user, rf):
+    class BackendNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Backend", url="/", permissions=["tests.backend_perm"])]
+
+    req = rf.get("/")
+    req.user = user
+
+    assert get_user_permissions(req) is None
+    assert user.has_perm("tests.backend_perm") is True
+    assert titles(BackendNav().get_context_data(req)["items"]) == ["Backend"]
+
+
+@override_settings(AUTHENTICATION_BACKENDS=["tests.test_permissions.VetoModelBackend"])
+@pytest.mark.parametrize("batch", [True, False])
+def test_permissions_backend_veto(batch, user, rf):
+    req = rf.get("/")
+    req.user = user
+
+    with override_settings(DJANGO_SIMPLE_NAV={"BATCH_PERMISSIONS": batch}):
+        items = PermissionNav().get_context_data(req)["items"]
+
+        assert get_user_permissions(req) is None
+
+    assert user.has_perm("tests.dummy_perm") is False
+    assert titles(items) == []
+
+
+@batched
+@override_settings(
+    AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.ModelBackend"]
+)
+def test_permissions_inactive_user(user, rf):
+    user.is_active = False
+    req = rf.get("/")
+    req.user = user
+
+    assert user_has_perm(req, "tests.dummy_perm") is ModelBackend().has_perm(
+        user, "tests.dummy_perm"
+    )
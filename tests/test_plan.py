@@ -0,0 +1,906 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import resolve
+from django.utils import translation
+from model_bakery import baker
+
+from django_simple_nav._plan import NavPlan
+from django_simple_nav._plan import PathTrie
+from django_simple_nav._plan import PatternMatcher
+from django_simple_nav._plan import PermissionCheck
+from django_simple_nav._plan import URLTable
+from django_simple_nav._plan import _cache_set
+from django_simple_nav._plan import get_nav_plan
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavGroup
+from django_simple_nav.nav import NavItem
+from django_simple_nav.nav import NavItemContext
+from tests.navs import DummyNav
+
+pytestmark = pytest.mark.django_db
+
+
+def evaluate_without_plan(nav_class, request):
+    nav = Nav(
+        template_name=nav_class.template_name,
+        items=nav_class.items,
+        match_query=nav_class.match_query,
+    )
+    assert get_nav_plan(nav) is None
+    return nav.get_context_data(request)
+
+
+def test_plan_layout():
+    class LayoutNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [
+            NavItem(title="A", url="/a/"),
+            NavGroup(
+                title="B",
+                items=[
+                    NavItem(title="B1", url="/b1/"),
+                    NavGroup(title="B2", items=[NavItem(title="B2a", url="/b2a/")]),
+                ],
+            ),
+        ]
+
+    plan = get_nav_plan(LayoutNav())
+
+    assert [node.title for node in plan.nodes] == ["A", "B", "B1", "B2", "B2a"]
+    assert plan.num_roots == 2
+    assert list(plan.parent) == [-1, -1, 1, 1, 3]
+    assert list(plan.depth) == [0, 0, 1, 1, 2]
+    assert list(zip(plan.child_start, plan.child_end, strict=True)) == [
+        (2, 2),
+        (2, 4),
+        (4, 4),
+        (4, 5),
+        (5, 5),
+    ]
+
+
+def test_plan_cached_on_class():
+    assert get_nav_plan(DummyNav()) is get_nav_plan(DummyNav())
+
+
+@pytest.mark.parametrize(
+    "user_kwargs",
+    [
+        None,
+        {},
+        {"is_staff": True},
+        {"is_superuser": True},
+    ],
+)
+def test_plan_matches_method_evaluation(user_kwargs, rf):
+    req = rf.get("/group/")
+    if user_kwargs is None:
+        req.user = AnonymousUser()
+    else:
+        req.user = baker.make(get_user_model(), **user_kwargs)
+
+    planned = DummyNav().get_context_data(req)
+
+    assert get_nav_plan(DummyNav()) is not None
+    assert planned == evaluate_without_plan(DummyNav, req)
+    assert all(isinstance(item, NavItemContext) for item in planned["items"])
+
+
+def test_plan_extra_context_shadowing(req):
+    class ExtraContextNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [
+            NavItem(
+                title="Item",
+                url="/item/",
+                extra_context={"title": "Shadowed", "items": "kept", "foo": "bar"},
+            ),
+            NavGroup(
+                title="Group",
+                items=[NavItem(title="Child", url="/child/")],
+                extra_context={"items": "shadowed", "foo": "baz"},
+            ),
+        ]
+
+    assert ExtraContextNav().get_context_data(req) == evaluate_without_plan(
+        ExtraContextNav, req
+    )
+
+
+def test_plan_url_table_follows_append_slash(req):
+    class AppendSlashNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Item", url="/item")]
+
+    with override_settings(APPEND_SLASH=True):
+        assert AppendSlashNav().get_context_data(req)["items"][0]["url"] == "/item/"
+
+    with override_settings(APPEND_SLASH=False):
+        assert AppendSlashNav().get_context_data(req)["items"][0]["url"] == "/item"
+
+
+@override_settings(ROOT_URLCONF="tests.i18n_urls")
+def test_plan_url_table_follows_language(req):
+    class NamedURLNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Item", url="fake-view")]
+
+    with translation.override("en"):
+        assert NamedURLNav().get_context_data(req)["items"][0]["url"] == (
+            "/en/fake-view/"
+        )
+    with translation.override("fr"):
+        assert NamedURLNav().get_context_data(req)["items"][0]["url"] == (
+            "/fr/fake-view/"
+        )
+
+
+def test_plan_callable_url_resolved_per_request(req):
+    urls = iter(["/first/", "/second/"])
+
+    class CallableURLNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Item", url=lambda: next(urls))]
+
+    assert CallableURLNav().get_context_data(req)["items"][0]["url"] == "/first/"
+    assert CallableURLNav().get_context_data(req)["items"][0]["url"] == "/second/"
+
+
+def test_plan_missing_url_raises(req):
+    class MissingURLNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Item")]
+
+    with pytest.raises(ImproperlyConfigured):
+        MissingURLNav().get_context_data(req)
+
+
+def test_plan_skipped_for_overridden_node():
+    class ActiveNavItem(NavItem):
+        def get_active(self, request):
+            return True
+
+    class OverriddenNodeNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavGroup(title="Group", items=[ActiveNavItem(title=..., url="/")])]
+
+    assert get_nav_plan(OverriddenNodeNav()) is None
+
+
+def test_plan_skipped_for_overridden_get_items():
+    class GetItemsNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [NavItem(title="Item", url="/")]
+
+        def get_items(self, request):
+            return []
+
+    assert get_nav_plan(GetItemsNav()) is None
+
+
+def test_plan_skipped_for_instance_items():
+    nav = Nav(template_name="tests/dummy_nav.html", items=[NavItem(title=..., url="/")])
+
+    assert get_nav_plan(nav) is None
+
+
+class ActiveNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    items = [
+        NavItem(title="Home", url="/"),
+        NavItem(title="Absolute", url="http://testserver/absolute/"),
+        NavItem(title="Other host", url="http://example.com/absolute/"),
+        NavItem(title="Query", url="/search/?q=nav&page=1"),
+        NavItem(title="No slash", url="/no-slash", append_slash=False),
+        NavGroup(
+            title="Group",
+            items=[
+                NavItem(title="Child", url="/group/child/"),
+                NavGroup(
+                    title="Nested",
+                    url="/group/nested/",
+                    items=[
+                        NavItem(title="Grandchild", url="/group/nested/grandchild/"),
+                        NavItem(
+                            title="Hidden",
+                            url="/group/nested/hidden/",
+                            permissions=["is_superuser"],
+                        ),
+                    ],
+                ),
+            ],
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/",
+        "/absolute/",
+        "/absolute",
+        "/search/?page=1&q=nav",
+        "/search/?q=nav",
+        "/no-slash",
+        "/no-slash/",
+        "/group/child",
+        "/group/nested/",
+        "/group/nested/grandchild/",
+        "/group/nested/hidden/",
+        "/unknown/",
+    ],
+)
+def test_plan_active_index_matches_method_evaluation(path, rf):
+    req = rf.get(path)
+    req.user = AnonymousUser()
+
+    assert ActiveNav().get_context_data(req) == evaluate_without_plan(ActiveNav, req)
+
+
+def test_plan_active_index_propagates_to_ancestors(rf):
+    req = rf.get("/group/nested/grandchild/")
+    req.user = AnonymousUser()
+
+    items = ActiveNav().get_context_data(req)["items"]
+    group = items[-1]
+    nested = group["items"][1]
+
+    assert group["active"] is True
+    assert nested["active"] is True
+    assert nested["items"][0]["active"] is True
+    assert not any(item["active"] for item in items[:-1])
+
+
+def test_plan_active_index_hidden_node_does_not_propagate(rf):
+    req = rf.get("/group/nested/hidden/")
+    req.user = AnonymousUser()
+
+    group = ActiveNav().get_context_data(req)["items"][-1]
+
+    assert group["active"] is False
+    assert [item["title"] for item in group["items"][1]["items"]] == ["Grandchild"]
+
+
+def test_plan_active_index_single_lookup(rf, monkeypatch):
+    lookups = []
+    lookup = URLTable.lookup
+
+    def counting_lookup(self, parsed_request):
+        lookups.append(parsed_request)
+        return lookup(self, parsed_request)
+
+    monkeypatch.setattr(URLTable, "lookup", counting_lookup)
+    req = rf.get("/group/child/")
+    req.user = AnonymousUser()
+
+    ActiveNav().get_context_data(req)
+
+    assert len(lookups) == 1
+
+
+class SectionNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    items = [
+        NavItem(title="Home", url="/"),
+        NavItem(title="Blog", url="/blog/", match="longest_prefix"),
+        NavGroup(
+            title="Docs",
+            url="/docs/",
+            match="longest_prefix",
+            items=[
+                NavItem(title="Guide", url="/docs/guide/", match="longest_prefix"),
+                NavItem(
+                    title="Internal",
+                    url="/docs/guide/internal/",
+                    match="longest_prefix",
+                    permissions=["is_staff"],
+                ),
+                NavItem(title="API", url="/docs/api/", match="prefix"),
+            ],
+        ),
+        NavItem(title="Archive", url="/blog/archive/", match="prefix"),
+    ]
+
+
+def active_titles(items):
+    titles = []
+    for item in items:
+        if item["active"]:
+            titles.append(item["title"])
+        titles.extend(active_titles(item["items"] or []))
+    return titles
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("/", ["Home"]),
+        ("/blog/", ["Blog"]),
+        ("/blog/2024/post/", ["Blog"]),
+        ("/blogroll/", []),
+        ("/docs/", ["Docs"]),
+        ("/docs/guide/intro/", ["Docs", "Guide"]),
+        ("/docs/api/v1/", ["Docs", "API"]),
+        # `prefix` items don't compete with `longest_prefix` ones
+        ("/blog/archive/2023/", ["Blog", "Archive"]),
+        # nodes the user cannot see never win
+        ("/docs/guide/internal/", ["Docs", "Guide"]),
+    ],
+)
+def test_plan_prefix_match(path, expected, rf):
+    req = rf.get(path)
+    req.user = AnonymousUser()
+
+    items = SectionNav().get_context_data(req)["items"]
+
+    assert active_titles(items) == expected
+
+
+def test_plan_longest_prefix_visible_deeper_node_wins(rf):
+    req = rf.get("/docs/guide/internal/page/")
+    req.user = baker.make(get_user_model(), is_staff=True)
+
+    items = SectionNav().get_context_data(req)["items"]
+
+    assert active_titles(items) == ["Docs", "Internal"]
+
+
+def test_plan_prefix_match_single_trie_walk(rf, monkeypatch):
+    walks = []
+    walk = PathTrie.walk
+
+    def counting_walk(self, segments):
+        walks.append(segments)
+        return walk(self, segments)
+
+    monkeypatch.setattr(PathTrie, "walk", counting_walk)
+    req = rf.get("/docs/guide/intro/")
+    req.user = AnonymousUser()
+
+    SectionNav().get_context_data(req)
+
+    assert walks == [("docs", "guide", "intro")]
+
+
+class PatternNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    items = [
+        NavItem(title="Orders", url="/orders/", active_patterns=[r"^/orders/\d+/"]),
+        NavItem(title="Invoices", url="/invoices/", active_patterns=[r"^/invoices/"]),
+        NavGroup(
+            title="Reports",
+            items=[
+                NavItem(title="Daily", url="/reports/daily/"),
+                NavItem(
+                    title="Custom",
+                    url="/reports/custom/",
+                    active_patterns=[r"^/reports/(?P<slug>[\w-]+)/edit/$"],
+                ),
+                NavItem(
+                    title="Admin",
+                    url="/reports/admin/",
+                    active_patterns=[r"(?i)^/REPORTS/"],
+                    permissions=["is_staff"],
+                ),
+            ],
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/orders/",
+        "/orders/42/",
+        "/orders/new/",
+        "/invoices/2024/",
+        "/reports/daily/",
+        "/reports/weekly/edit/",
+        "/reports/",
+    ],
+)
+def test_plan_active_patterns_match_method_evaluation(path, rf):
+    req = rf.get(path)
+    req.user = AnonymousUser()
+
+    assert PatternNav().get_context_data(req) == evaluate_without_plan(PatternNav, req)
+
+
+def test_plan_active_patterns(rf):
+    req = rf.get("/reports/weekly/edit/")
+    req.user = baker.make(get_user_model(), is_staff=True)
+
+    items = PatternNav().get_context_data(req)["items"]
+
+    assert active_titles(items) == ["Reports", "Custom", "Admin"]
+
+
+def test_plan_active_patterns_combined():
+    plan = get_nav_plan(PatternNav())
+
+    matcher = plan.pattern_matcher
+
+    assert matcher.combined is not None
+    assert list(matcher.group_nodes.values()) == [0, 1]
+    # capturing groups and global flags are searched on their own
+    assert [idx for idx, _ in matcher.separate] == [4, 5]
+    assert matcher.match("/invoices/1/") == [1]
+    assert matcher.match("/reports/x/edit/") == [4, 5]
+
+
+def test_plan_active_patterns_single_match(rf, monkeypatch):
+    paths = []
+    match = PatternMatcher.match
+
+    def counting_match(self, path):
+        paths.append(path)
+        return match(self, path)
+
+    monkeypatch.setattr(PatternMatcher, "match", counting_match)
+    req = rf.get("/orders/42/")
+    req.user = AnonymousUser()
+
+    PatternNav().get_context_data(req)
+
+    assert paths == ["/orders/42/"]
+
+
+class ViewNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    items = [
+        NavItem(title="Home", url="home", match="view"),
+        NavGroup(
+            title="Group",
+            items=[
+                NavItem(title="Fake view", url="fake-view", match="view"),
+                NavItem(title="Fake view path", url="/fake-view/"),
+            ],
+        ),
+    ]
+
+
+@pytest.mark.parametrize("resolved", [True, False])
+@pytest.mark.parametrize(
+    "path", ["/", "/fake-view/", "/fake-view/?page=2", "/unknown/"]
+)
+def test_plan_match_view_matches_method_evaluation(path, resolved, rf):
+    req = rf.get(path)
+    req.user = AnonymousUser()
+    if resolved and path != "/unknown/":
+        req.resolver_match = resolve(path.partition("?")[0])
+
+    assert ViewNav().get_context_data(req) == evaluate_without_plan(ViewNav, req)
+
+
+def test_plan_match_view_uses_resolver_match(rf):
+    req = rf.get("/en/fake-view/")
+    req.user = AnonymousUser()
+    req.resolver_match = resolve("/fake-view/")
+
+    items = ViewNav().get_context_data(req)["items"]
+
+    assert active_titles(items) == ["Group", "Fake view"]
+
+
+def test_plan_match_view_index():
+    plan = get_nav_plan(ViewNav())
+
+    assert plan.view_index == {"home": [0], "fake-view": [2]}
+
+
+class QueryNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    match_query = "ignore"
+    items = [
+        NavItem(title="Default", url="/list/"),
+        NavItem(title="Exact", url="/list/?tab=open", match_query="exact"),
+        NavItem(title="Subset", url="/list/?tab=open", match_query="subset"),
+        NavItem(title="Keys", url="/search/?q=nav", match_query=["q"]),
+        NavItem(title="View", url="fake-view", match="view", match_query="subset"),
+        NavItem(title="Dynamic", url=lambda: "/list/?tab=open", match_query="subset"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("/list/", ["Default"]),
+        ("/list/?page=2", ["Default"]),
+        ("/list/?tab=open", ["Default", "Exact", "Subset", "Dynamic"]),
+        ("/list/?tab=open&page=2", ["Default", "Subset", "Dynamic"]),
+        ("/list/?tab=closed", ["Default"]),
+        ("/search/?q=nav&utm_source=mail", ["Keys"]),
+        ("/search/?q=other", []),
+        ("/search/", []),
+        ("/fake-view/?x=1", ["View"]),
+    ],
+)
+def test_plan_match_query(path, expected, rf):
+    req = rf.get(path)
+    req.user = AnonymousUser()
+
+    items = QueryNav().get_context_data(req)["items"]
+
+    assert active_titles(items) == expected
+    assert items == evaluate_without_plan(QueryNav, req)["items"]
+
+
+def test_plan_match_query_instance_override(rf):
+    req = rf.get("/list/?page=2")
+    req.user = AnonymousUser()
+
+    nav = QueryNav(match_query="exact")
+
+    assert get_nav_plan(nav) is None
+    assert active_titles(nav.get_context_data(req)["items"]) == []
+
+
+def test_plan_match_query_invalid(rf):
+    class InvalidQueryNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        match_query = "loose"
+        items = [NavItem(title="Home", url="/")]
+
+    req = rf.get("/")
+    req.user = AnonymousUser()
+
+    with pytest.raises(ImproperlyConfigured):
+        InvalidQueryNav().get_context_data(req)
+
+
+class MaskNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    items = [
+        NavItem(title="Public", url="/"),
+        NavItem(title="Staff", url="/staff/", permissions=["is_staff"]),
+        NavGroup(
+            title="Reports",
+            permissions=["is_authenticated"],
+            items=[
+                NavItem(
+                    title="Sales",
+                    url="/reports/sales/",
+                    permissions=["is_staff", "tests.view_sales"],
+                ),
+                NavItem(
+                    title="Callable",
+                    url="/reports/callable/",
+                    permissions=["is_staff", lambda request: True],
+                ),
+            ],
+        ),
+    ]
+
+
+def test_plan_permission_masks():
+    plan = get_nav_plan(MaskNav())
+
+    assert plan.permission_bits == {
+        "is_staff": 1,
+        "is_authenticated": 2,
+        "tests.view_sales": 4,
+    }
+    assert plan.required_masks == [0, 1, 2, 5, 1]
+    assert [len(callables) for callables in plan.callable_permissions] == [
+        0,
+        0,
+        0,
+        0,
+        1,
+    ]
+
+
+@pytest.mark.parametrize(
+    "user_kwargs,expected",
+    [
+        (None, ["Public"]),
+        ({}, ["Public"]),
+        ({"is_staff": True}, ["Public", "Staff", "Reports", "Callable"]),
+        (
+            {"is_superuser": True},
+            ["Public", "Staff", "Reports", "Sales", "Callable"],
+        ),
+    ],
+)
+def test_plan_permission_masks_filter(user_kwargs, expected, rf):
+    req = rf.get("/")
+    req.user = (
+        AnonymousUser()
+        if user_kwargs is None
+        else baker.make(get_user_model(), **user_kwargs)
+    )
+
+    items = MaskNav().get_context_data(req)["items"]
+
+    assert titles(items) == expected
+    assert items == evaluate_without_plan(MaskNav, req)["items"]
+
+
+def test_plan_permission_callable_skipped_when_mask_fails(rf):
+    calls = []
+
+    class CallableNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [
+            NavItem(
+                title="Callable",
+                url="/",
+                permissions=[lambda request: calls.append(request) or True, "is_staff"],
+            ),
+        ]
+
+    req = rf.get("/")
+    req.user = AnonymousUser()
+
+    assert CallableNav().get_context_data(req)["items"] == []
+    assert calls == []
+
+
+def titles(items):
+    return [
+        title
+        for item in items
+        for title in [item["title"], *titles(item["items"] or [])]
+    ]
+
+
+def make_cached_nav(*permissions):
+    class CachedNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [
+            NavItem(title="Public", url="/"),
+            NavItem(title="Private", url="/private/", permissions=list(permissions)),
+        ]
+
+    return CachedNav
+
+
+@pytest.fixture
+def filters(monkeypatch):
+    filters = []
+    filter_ = NavPlan.filter
+
+    def counting_filter(self, permission_check):
+        if isinstance(permission_check, PermissionCheck):
+            filters.append(permission_check.key)
+        return filter_(self, permission_check)
+
+    monkeypatch.setattr(NavPlan, "filter", counting_filter)
+    return filters
+
+
+def request_for(rf, user):
+    req = rf.get("/")
+    req.user = user
+    return req
+
+
+def user_with(*codenames):
+    user = baker.make(get_user_model())
+    content_type = baker.make("contenttypes.ContentType", app_label="tests")
+    for codename in codenames:
+        user.user_permissions.add(
+            baker.make("auth.Permission", codename=codename, content_type=content_type)
+        )
+    return user
+
+
+def test_plan_filter_cache_shared_by_unrelated_permissions(filters, rf):
+    nav = make_cached_nav("tests.private")()
+
+    first = nav.get_context_data(request_for(rf, user_with()))
+    second = nav.get_context_data(request_for(rf, user_with("unrelated")))
+    private = nav.get_context_data(request_for(rf, user_with("private")))
+
+    assert titles(first["items"]) == titles(second["items"]) == ["Public"]
+    assert titles(private["items"]) == ["Public", "Private"]
+    assert len(filters) == 2
+
+
+def test_plan_filter_cache_callable_result(filters, rf):
+    results = iter([True, False, True])
+    nav = make_cached_nav(lambda request: next(results))()
+
+    visible = [
+        len(nav.get_context_data(request_for(rf, AnonymousUser()))["items"])
+        for _ in range(3)
+    ]
+
+    assert visible == [2, 1, 2]
+    assert len(filters) == 2
+
+
+def test_plan_filter_cache_callable_cache_key(filters, rf):
+    calls = []
+
+    def is_beta(request):
+        calls.append(request)
+        return request.GET.get("beta") == "1"
+
+    is_beta.cache_key = lambda request: request.GET.get("beta")
+    nav = make_cached_nav(is_beta)()
+
+    for _ in range(3):
+        req = rf.get("/", {"beta": "1"})
+        req.user = AnonymousUser()
+        assert len(nav.get_context_data(req)["items"]) == 2
+
+    assert len(calls) == 1
+    assert len(filters) == 1
+
+
+def test_plan_filter_cache_callable_not_cacheable(filters, rf):
+    def is_beta(request):
+        return True
+
+    is_beta.cacheable = False
+    nav = make_cached_nav(is_beta)()
+
+    for _ in range(2):
+        nav.get_context_data(request_for(rf, AnonymousUser()))
+
+    assert len(filters) == 2
+
+
+def test_plan_filter_cache_not_cacheable_callable_not_consulted(filters, rf):
+    def is_beta(request):
+        return True
+
+    is_beta.cacheable = False
+    nav = make_cached_nav("is_staff", is_beta)()
+
+    for _ in range(2):
+        nav.get_context_data(request_for(rf, baker.make(get_user_model())))
+
+    # `is_staff` already hides the item, so the callable never matters
+    assert len(filters) == 1
+
+
+def test_plan_filter_cache_bounded(filters, rf, monkeypatch):
+    monkeypatch.setattr("django_simple_nav._plan.FILTER_CACHE_SIZE", 1)
+    nav = make_cached_nav("tests.private")()
+    users = [user_with(), user_with("private")]
+
+    for user in [*users, users[0]]:
+        nav.get_context_data(request_for(rf, user))
+
+    assert len(filters) == 3
+    assert len(get_nav_plan(nav)._reachable) == 1
+
+
+def test_plan_filter_cache_set_threads(monkeypatch):
+    monkeypatch.setattr("django_simple_nav._plan.FILTER_CACHE_SIZE", 8)
+    cache = {}
+    errors = []
+
+    def fill(offset):
+        try:
+            for key in range(offset, offset + 2000):
+                _cache_set(cache, key, key)
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=fill, args=(n * 2000,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(cache) == 8
+
+
+class TierNav(Nav):
+    template_name = "tests/dummy_nav.html"
+    items = [
+        NavItem(title="Public", url="/"),
+        NavItem(title="Log in", url="/login/", permissions=["is_anonymous"]),
+        NavItem(title="Account", url="/account/", permissions=["is_authenticated"]),
+        NavGroup(
+            title="Admin",
+            items=[
+                NavItem(title="Users", url="/admin/users/", permissions=["is_staff"])
+            ],
+        ),
+    ]
+
+
+@pytest.fixture
+def no_permission_check(monkeypatch):
+    def fail(*args, **kwargs):
+        pytest.fail("PermissionCheck should not be used for a precomputed tier")
+
+    monkeypatch.setattr("django_simple_nav._plan.PermissionCheck", fail)
+
+
+@pytest.mark.parametrize(
+    "user,expected",
+    [
+        ("none", ["Public"]),
+        ("anonymous", ["Public", "Log in"]),
+        ("authenticated", ["Public", "Account"]),
+        ("staff", ["Public", "Account", "Admin", "Users"]),
+        ("superuser", ["Public", "Log in", "Account", "Admin", "Users"]),
+    ],
+)
+def test_plan_tiers(user, expected, rf, no_permission_check):
+    req = rf.get("/")
+    if user == "anonymous":
+        req.user = AnonymousUser()
+    elif user != "none":
+        req.user = baker.make(
+            get_user_model(),
+            is_staff=user == "staff",
+            is_superuser=user == "superuser",
+        )
+
+    items = TierNav().get_context_data(req)["items"]
+
+    assert titles(items) == expected
+
+
+def test_plan_tiers_match_method_evaluation(rf):
+    for user in [None, AnonymousUser(), baker.make(get_user_model(), is_staff=True)]:
+        req = rf.get("/admin/users/")
+        if user is not None:
+            req.user = user
+
+        assert TierNav().get_context_data(req) == evaluate_without_plan(TierNav, req)
+
+
+def test_plan_tiers_precomputed():
+    plan = get_nav_plan(TierNav())
+
+    # authenticated users' trees are added as they come in
+    assert {tier for tier in plan.tiers if isinstance(tier, str)} == {
+        "none",
+        "superuser",
+        "anonymous",
+    }
+
+
+def test_plan_tiers_anonymous_with_callable():
+    class CallableTierNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [
+            NavItem(title="Beta", url="/beta/", permissions=[lambda request: True]),
+            NavItem(
+                title="Staff beta",
+                url="/staff/beta/",
+                permissions=["is_staff", lambda request: True],
+            ),
+        ]
+
+    plan = get_nav_plan(CallableTierNav())
+
+    assert set(plan.tiers) == {"none", "superuser"}
+    assert plan.attribute_only is False
+
+
+def test_plan_tiers_anonymous_callable_not_reachable():
+    class StaffCallableNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [
+            NavItem(
+                title="Staff beta",
+                url="/staff/beta/",
+                permissions=["is_staff", lambda request: True],
+            ),
+        ]
+
+    plan = get_nav_plan(StaffCallableNav())
+
+    assert "anonymous" in plan.tiers
+
+
+def test_plan_tiers_model_permission():
+    plan = get_nav_plan(MaskNav())
+
+    assert "anonymous" not in plan.tiers
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+
+from django_simple_nav._request import parse_request
+from django_simple_nav._request import query_key
+from django_simple_nav._request import query_matches
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavGroup
+from django_simple_nav.nav import NavItem
+
+pytestmark = pytest.mark.django_db
+
+
+def test_parse_request(rf):
+    req = rf.get("/test", {"b": "2", "a": "1"})
+
+    parsed = parse_request(req)
+
+    assert parsed.scheme == "http"
+    assert parsed.netloc == "testserver"
+    assert parsed.path == "/test"
+    assert parsed.path_slash == "/test/"
+    assert parsed.query_params == {"a": ["1"], "b": ["2"]}
+    assert parsed.query_key == (("a", ("1",)), ("b", ("2",)))
+
+
+def test_parse_request_cached_on_request(rf):
+    req = rf.get("/test/")
+
+    assert parse_request(req) is parse_request(req)
+
+
+def test_parse_request_reparsed_after_path_change(rf):
+    req = rf.get("/test/")
+    parsed = parse_request(req)
+
+    req.path = "/other/"
+
+    assert parse_request(req) is not parsed
+    assert parse_request(req).path == "/other/"
+
+
+def test_build_absolute_uri_called_once_per_request(rf, monkeypatch):
+    calls = []
+    req = rf.get("/about/team/")
+    req.user = AnonymousUser()
+    build_absolute_uri = req.build_absolute_uri
+
+    def counting_build_absolute_uri(*args, **kwargs):
+        calls.append(1)
+        return build_absolute_uri(*args, **kwargs)
+
+    monkeypatch.setattr(req, "build_absolute_uri", counting_build_absolute_uri)
+
+    class FirstNav(Nav):
+        template_name = "tests/dummy_nav.html"
+        items = [
+            NavItem(title="Home", url="/"),
+            NavGroup(title="About", items=[NavItem(title="Team", url="/about/team/")]),
+        ]
+
+    second_nav = Nav(
+        template_name="tests/dummy_nav.html",
+        items=[
+            NavItem(title="Team", url="/about/team/"),
+            NavItem(title="Jobs", url="/jobs/"),
+        ],
+    )
+
+    assert FirstNav().get_context_data(req)["items"][1]["active"] is True
+    assert second_nav.get_context_data(req)["items"][0]["active"] is True
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("", ()),
+        ("a=1&b=2", (("a", ("1",)), ("b", ("2",)))),
+        ("b=2&a=1", (("a", ("1",)), ("b", ("2",)))),
+        ("a=2&a=1", (("a", ("2", "1")),)),
+    ],
+)
+def test_query_key(query, expected):
+    assert query_key(query) == expected
+
+
+@pytest.mark.parametrize(
+    "policy,item_query,request_query,expected",
+    [
+        ("ignore", "a=1", "b=2", True),
+        ("exact", "a=1&b=2", "b=2&a=1", True),
+        ("exact", "a=1", "a=1&b=2", False),
+        ("subset", "a=1", "a=1&b=2", True),
+        ("subset", "a=1&a=2", "a=1", False),
+        ("subset", "", "a=1", True),
+        (("a",), "a=1&b=2", "a=1&b=3", True),
+        (("a",), "", "a=1", False),
+        (("a", "b"), "a=1", "a=1", True),
+    ],
+)
+def test_query_matches(policy, item_query, request_query, expected):
+    assert (
+        query_matches(policy, query_key(item_query), query_key(request_query))
+        == expected
+    )
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import Permission
+from django.core.cache import caches
+from django.db import transaction
+from django.test import override_settings
+from model_bakery import baker
+
+from django_simple_nav import _cache
+from django_simple_nav._cache import VERSION_KEY
+from django_simple_nav._cache import get_version
+
+# invalidation waits for the transaction to commit
+pytestmark = pytest.mark.django_db(transaction=True)
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "navs": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "navs",
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache():
+    with override_settings(CACHES=CACHES, DJANGO_SIMPLE_NAV={"CACHE_ENABLED": True}):
+        yield
+        for alias in CACHES:
+            caches[alias].clear()
+    _cache._versions.clear()
+
+
+@pytest.fixture
+def user():
+    return baker.make(get_user_model())
+
+
+@pytest.fixture
+def permission():
+    return baker.make(
+        Permission,
+        codename="signal_perm",
+        content_type=baker.make("contenttypes.ContentType", app_label="tests"),
+    )
+
+
+@pytest.fixture
+def version():
+    version = get_version("default")
+
+    def bumped():
+        _cache._versions.clear()
+        return get_version("default") != version
+
+    return bumped
+
+
+def test_user_permissions_changed(user, permission, version):
+    user.user_permissions.add(permission)
+
+    assert version()
+
+
+def test_user_permissions_cleared(user, permission, version):
+    user.user_permissions.clear()
+
+    assert version()
+
+
+def test_user_groups_changed(user, version):
+    user.groups.add(baker.make(Group))
+
+    assert version()
+
+
+def test_group_permissions_changed(permission, version):
+    group = baker.make(Group)
+    version_before_add = version()
+
+    group.permissions.add(permission)
+
+    assert not version_before_add
+    assert version()
+
+
+@pytest.mark.parametrize("update_fields", [None, ["is_staff"], ["is_superuser"]])
+def test_user_saved(user, update_fields, version):
+    user.is_staff = True
+    user.save(update_fields=update_fields)
+
+    assert version()
+
+
+def test_user_saved_unrelated_fields(user, version):
+    user.save(update_fields=["last_login"])
+
+    assert not version()
+
+
+def test_user_created(version):
+    baker.make(get_user_model())
+
+    assert not version()
+
+
+def test_invalidates_used_aliases(user):
+    navs_version = get_version("navs")
+
+    user.groups.add(baker.make(Group))
+    _cache._versions.clear()
+
+    assert get_version("navs") != navs_version
+
+
+@override_settings(DJANGO_SIMPLE_NAV={"INVALIDATE_ON_PERMISSION_CHANGE": False})
+def test_invalidation_disabled(user, permission, version):
+    user.user_permissions.add(permission)
+
+    assert not version()
+
+
+@override_settings(DJANGO_SIMPLE_NAV={"CACHE_ENABLED": False})
+def test_cache_disabled(user):
+    user.is_staff = True
+    user.save()
+
+    assert caches["default"].get(VERSION_KEY) is None
+
+
+@override_settings(DJANGO_SIMPLE_NAV={"CACHE_ENABLED": False})
+def test_cache_disabled_nav_opted_in(user, version):
+    # `version` reads the version, as rendering a cached nav does
+    user.groups.add(baker.make(Group))
+
+    assert version()
+
+
+def test_invalidated_on_commit(user, permission, version):
+    with transaction.atomic():
+        user.user_permissions.add(permission)
+        assert not version()
+
+    assert version()
+
+
+def test_not_invalidated_on_rollback(user, permission, version):
+    with pytest.raises(RuntimeError), transaction.atomic():
+        user.user_permissions.add(permission)
+        raise RuntimeError
+
+    assert not version()
@@ -1,11 +1,25 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 import pytest
+from django import template
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.test import override_settings
+from django.utils.autoreload import file_changed
 
+from django_simple_nav import _templates as templates_module
+from django_simple_nav._templates import _templates
+from django_simple_nav._templates import clear_string_templates
+from django_simple_nav._templates import get_engine_template
+from django_simple_nav._templates import get_request_context
+from django_simple_nav._templates import get_string_template
+from django_simple_nav._templates import get_string_template_stats
 from django_simple_nav._templates import get_template_engine
+from django_simple_nav._templates import rendering
+from django_simple_nav.nav import Nav
+from django_simple_nav.nav import NavItem
 
 
 def test_get_template_engine():
@@ -66,6 +80,41 @@ def test_get_template_engine_multiple(templates, expected, caplog):
     assert "Multiple `BACKEND` defined for a template engine." in caplog.text
 
 
+@override_settings(
+    TEMPLATES=[
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+        },
+        {
+            "BACKEND": "django.template.backends.jinja2.Jinja2",
+        },
+    ]
+)
+def test_get_template_engine_multiple_warns_once(caplog):
+    with caplog.at_level("WARNING"):
+        engine = get_template_engine()
+        assert get_template_engine() is engine
+        assert get_template_engine() is engine
+
+    assert caplog.text.count("Multiple `BACKEND` defined") == 1
+
+
+def test_get_template_engine_reselected_on_setting_changed():
+    engine = get_template_engine()
+
+    assert get_template_engine() is engine
+
+    with override_settings(
+        DJANGO_SIMPLE_NAV={
+            "TEMPLATE_BACKEND": "django.template.backends.jinja2.Jinja2"
+        },
+        TEMPLATES=[{"BACKEND": "django.template.backends.jinja2.Jinja2"}],
+    ):
+        assert get_template_engine().name == "jinja2"
+
+    assert get_template_engine().name == engine.name
+
+
 @pytest.mark.parametrize(
     "using,expected",
     [
@@ -123,3 +172,279 @@ def test_get_template_engine_app_setting_invalid():
         get_template_engine()
 
         assert "Invalid `TEMPLATE_BACKEND` for a template engine" in exc_info
+
+
+PROCESSOR_CALLS = []
+
+
+def counting_processor(request):
+    PROCESSOR_CALLS.append(request)
+    return {"processor_value": "from-processor"}
+
+
+PROCESSOR_TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "APP_DIRS": True,
+        "DIRS": [Path(__file__).parent / "templates"],
+        "OPTIONS": {"context_processors": ["tests.test_templates.counting_processor"]},
+    }
+]
+
+
+def test_get_engine_template(monkeypatch):
+    engine = get_template_engine()
+    calls = []
+    get_template = engine.get_template
+
+    def counting_get_template(template_name):
+        calls.append(template_name)
+        return get_template(template_name)
+
+    monkeypatch.setattr(engine, "get_template", counting_get_template)
+
+    first = get_engine_template(engine, "tests/dummy_nav.html")
+
+    assert get_engine_template(engine, "tests/dummy_nav.html") is first
+    assert calls == ["tests/dummy_nav.html"]
+
+    file_changed.send(sender=None, file_path=Path("tests/dummy_nav.html"))
+
+    assert engine not in _templates
+    assert get_engine_template(engine, "tests/dummy_nav.html") is not first
+
+
+@pytest.fixture
+def string_templates():
+    clear_string_templates()
+    yield
+    clear_string_templates()
+
+
+def test_get_string_template(string_templates, monkeypatch):
+    engine = get_template_engine()
+    calls = []
+    from_string = engine.from_string
+
+    def counting_from_string(source):
+        calls.append(source)
+        return from_string(source)
+
+    monkeypatch.setattr(engine, "from_string", counting_from_string)
+    before = get_string_template_stats()
+
+    first = get_string_template(engine, "<p>{{ title }}</p>")
+
+    assert get_string_template(engine, "<p>{{ title }}</p>") is first
+    assert get_string_template(engine, "<p>{{ url }}</p>") is not first
+    assert calls == ["<p>{{ title }}</p>", "<p>{{ url }}</p>"]
+    stats = get_string_template_stats()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 2
+    assert stats["entries"] == 2
+
+
+def test_get_string_template_bounded(string_templates, monkeypatch):
+    monkeypatch.setattr(templates_module, "STRING_TEMPLATE_CACHE_SIZE", 2)
+    engine = get_template_engine()
+    before = get_string_template_stats()
+
+    first = get_string_template(engine, "first")
+    get_string_template(engine, "second")
+    get_string_template(engine, "first")
+    get_string_template(engine, "third")
+
+    assert get_string_template_stats()["evictions"] - before["evictions"] == 1
+    assert get_string_template_stats()["entries"] == 2
+    # "second" was the least recently used
+    assert get_string_template(engine, "first") is first
+
+
+def test_get_string_template_cleared_on_templates_change(string_templates):
+    first = get_string_template(get_template_engine(), "<p>{{ title }}</p>")
+
+    with override_settings(TEMPLATES=PROCESSOR_TEMPLATES):
+        assert get_string_template_stats()["entries"] == 0
+        assert (
+            get_string_template(get_template_engine(), "<p>{{ title }}</p>")
+            is not first
+        )
+
+
+def test_string_template_nav_compiled_once(string_templates, rf, monkeypatch):
+    class StringTemplateNav(Nav):
+        items = [NavItem(title="Item", url="/item/")]
+
+        def get_template(self, template_name=None):
+            return "{% for item in items %}<a>{{ item.title }}</a>{% endfor %}"
+
+    engine = get_template_engine()
+    calls = []
+    from_string = engine.from_string
+
+    def counting_from_string(source):
+        calls.append(source)
+        return from_string(source)
+
+    monkeypatch.setattr(engine, "from_string", counting_from_string)
+
+    assert StringTemplateNav().render(rf.get("/")) == "<a>Item</a>"
+    assert StringTemplateNav().render(rf.get("/")) == "<a>Item</a>"
+    assert len(calls) == 1
+
+
+@override_settings(TEMPLATES=PROCESSOR_TEMPLATES)
+def test_item_context_processors_run_once(rf):
+    class ProcessorNav(Nav):
+        template_name = "tests/self_render_nav.html"
+        items = [
+            NavItem(
+                title=f"Item {idx}",
+                url=f"/{idx}/",
+                template_name="tests/processor_navitem.html",
+            )
+            for idx in range(5)
+        ]
+
+    PROCESSOR_CALLS.clear()
+    req = rf.get("/")
+
+    rendered = ProcessorNav().render(req)
+
+    assert rendered.count("from-processor") == 5
+    # once for the nav's own template, once for all of its items
+    assert len(PROCESSOR_CALLS) == 2
+
+
+def marker_processor(request):
+    return {"processor_value": request.marker}
+
+
+@override_settings(
+    TEMPLATES=[
+        {
+            **PROCESSOR_TEMPLATES[0],
+            "OPTIONS": {
+                "context_processors": ["tests.test_templates.marker_processor"]
+            },
+        }
+    ]
+)
+def test_item_context_processors_run_per_render(rf):
+    class ProcessorNav(Nav):
+        template_name = "tests/self_render_nav.html"
+        items = [
+            NavItem(title="Item", url="/", template_name="tests/processor_navitem.html")
+        ]
+
+    req = rf.get("/")
+    req.marker = "before"
+
+    assert "Item before" in ProcessorNav().render(req)
+
+    # e.g. after `login()` later in the same request
+    req.marker = "after"
+
+    assert "Item after" in ProcessorNav().render(req)
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def request_path(context):
+    return context.request.path
+
+
+@override_settings(
+    TEMPLATES=[
+        {
+            **PROCESSOR_TEMPLATES[0],
+            "OPTIONS": {
+                **PROCESSOR_TEMPLATES[0]["OPTIONS"],
+                "libraries": {"nav_tests": "tests.test_templates"},
+            },
+        }
+    ]
+)
+def test_item_template_context_has_request(rf):
+    class RequestNav(Nav):
+        template_name = "tests/self_render_nav.html"
+        items = [
+            NavItem(title="Item", url="/", template_name="tests/request_navitem.html")
+        ]
+
+    PROCESSOR_CALLS.clear()
+    rendered = RequestNav().render(rf.get("/x/"))
+
+    assert '<a href="/">/x/ from-processor</a>' in rendered
+    assert len(PROCESSOR_CALLS) == 2
+
+
+def shadowing_processor(request):
+    return {"title": "PROC", "processor_value": "from-processor"}
+
+
+SHADOWING_TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [Path(__file__).parent / "templates"],
+        "OPTIONS": {"context_processors": ["tests.test_templates.shadowing_processor"]},
+    },
+    {
+        "BACKEND": "django.template.backends.jinja2.Jinja2",
+        "DIRS": [Path(__file__).parent / "jinja2"],
+        "OPTIONS": {"context_processors": ["tests.test_templates.shadowing_processor"]},
+    },
+]
+
+
+@pytest.mark.parametrize(
+    "backend,expected",
+    [
+        ("django.template.backends.django.DjangoTemplates", "Mine"),
+        ("django.template.backends.jinja2.Jinja2", "PROC"),
+    ],
+)
+def test_item_context_processor_precedence(backend, expected, rf):
+    item = NavItem(
+        title="Mine", url="/mine/", template_name="tests/processor_navitem.html"
+    )
+    req = rf.get("/")
+
+    with override_settings(
+        TEMPLATES=SHADOWING_TEMPLATES, DJANGO_SIMPLE_NAV={"TEMPLATE_BACKEND": backend}
+    ):
+        rendered = item.render(req)
+        # the same as rendering the template with the request
+        template = get_template_engine().get_template("tests/processor_navitem.html")
+        assert rendered == template.render(item.get_context_data(req), req)
+
+    assert f">{expected} from-processor<" in rendered
+
+
+def test_get_request_context_django(rf):
+    engine = get_template_engine()
+    req = rf.get("/")
+
+    with rendering(req):
+        context = get_request_context(engine, req)
+
+        assert "csrf_token" in context
+        assert get_request_context(engine, req) is context
+
+    with rendering(req):
+        assert get_request_context(engine, req) is not context
+    assert get_request_context(engine, req) is not context
+
+
+@override_settings(
+    TEMPLATES=[{"BACKEND": "django.template.backends.jinja2.Jinja2"}],
+)
+def test_get_request_context_jinja2(rf):
+    req = rf.get("/")
+
+    context = get_request_context(get_template_engine(), req)
+
+    assert context["request"] is req
+    assert {"csrf_input", "csrf_token"} <= context.keys()
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import pytest
+from django.test import override_settings
+from django.urls import clear_url_caches
+from django.urls import reverse_lazy
+from django.urls import set_urlconf
+from django.utils import translation
+from django.utils.functional import lazy
+
+from django_simple_nav import _urls
+from django_simple_nav._urls import URLKind
+from django_simple_nav._urls import classify_url
+from django_simple_nav._urls import clear_url_cache
+from django_simple_nav._urls import get_partition
+from django_simple_nav._urls import resolve_url
+
+
+@pytest.fixture(autouse=True)
+def reverse_calls(monkeypatch):
+    calls = []
+    reverse = _urls.reverse
+
+    def counting_reverse(viewname, *args, **kwargs):
+        calls.append(viewname)
+        return reverse(viewname, *args, **kwargs)
+
+    clear_url_cache()
+    monkeypatch.setattr(_urls, "reverse", counting_reverse)
+    yield calls
+    clear_url_cache()
+
+
+@pytest.mark.parametrize(
+    "spec,append_slash,expected",
+    [
+        ("/basic", True, "/basic/"),
+        ("/basic", False, "/basic"),
+        ("fake-view", True, "/fake-view/"),
+        (
+            "https://example.com/path?query=param",
+            True,
+            "https://example.com/path/?query=param",
+        ),
+        ("#", False, ""),
+        (None, True, None),
+    ],
+)
+def test_resolve_url(spec, append_slash, expected):
+    assert resolve_url(spec, append_slash) == expected
+
+
+def test_resolve_url_literal_reversed_once(reverse_calls):
+    for _ in range(3):
+        assert resolve_url("/basic/", True) == "/basic/"
+
+    assert reverse_calls == ["/basic/"]
+
+
+def test_resolve_url_keyed_by_append_slash(reverse_calls):
+    assert resolve_url("/basic", True) == "/basic/"
+    assert resolve_url("/basic", False) == "/basic"
+
+    assert reverse_calls == ["/basic", "/basic"]
+
+
+def test_resolve_url_lazy_cached():
+    calls = []
+
+    def counting_str():
+        calls.append(1)
+        return "/lazy"
+
+    spec = lazy(counting_str, str)()
+
+    assert resolve_url(spec, True) == "/lazy/"
+    assert resolve_url(spec, True) == "/lazy/"
+    assert len(calls) == 1
+
+
+def test_resolve_url_reverse_lazy():
+    assert resolve_url(reverse_lazy("fake-view"), False) == "/fake-view/"
+
+
+def test_resolve_url_callable_not_cached():
+    urls = iter(["/first", "/second"])
+
+    assert resolve_url(lambda: next(urls), True) == "/first/"
+    assert resolve_url(lambda: next(urls), True) == "/second/"
+
+
+def test_clear_url_caches_invalidates(reverse_calls):
+    resolve_url("fake-view", True)
+    partition = get_partition()
+
+    clear_url_caches()
+    resolve_url("fake-view", True)
+
+    assert get_partition() is not partition
+    assert reverse_calls == ["fake-view", "fake-view"]
+
+
+def test_setting_changed_invalidates(reverse_calls):
+    assert resolve_url("fake-view", True) == "/fake-view/"
+
+    with override_settings(ROOT_URLCONF="tests.alternate_urls"):
+        assert resolve_url("fake-view", True) == "/alternate/fake-view/"
+
+    assert resolve_url("fake-view", True) == "/fake-view/"
+    assert reverse_calls == ["fake-view", "fake-view", "fake-view"]
+
+
+@override_settings(ROOT_URLCONF="tests.i18n_urls")
+def test_resolve_url_keyed_by_language(reverse_calls):
+    with translation.override("en"):
+        assert resolve_url("fake-view", True) == "/en/fake-view/"
+    with translation.override("fr"):
+        assert resolve_url("fake-view", True) == "/fr/fake-view/"
+    with translation.override("en"):
+        assert resolve_url("fake-view", True) == "/en/fake-view/"
+
+    assert reverse_calls == ["fake-view", "fake-view"]
+
+
+def test_request_urlconf_partition(reverse_calls):
+    assert resolve_url("fake-view", True) == "/fake-view/"
+
+    set_urlconf("tests.alternate_urls")
+    try:
+        assert get_partition().urlconf == "tests.alternate_urls"
+        assert resolve_url("fake-view", True) == "/alternate/fake-view/"
+        assert resolve_url("fake-view", True) == "/alternate/fake-view/"
+    finally:
+        set_urlconf(None)
+
+    assert resolve_url("fake-view", True) == "/fake-view/"
+    assert reverse_calls == ["fake-view", "fake-view"]
+
+
+@pytest.mark.parametrize(
+    "spec,expected",
+    [
+        (None, URLKind.NONE),
+        ("", URLKind.LITERAL),
+        ("/basic/", URLKind.LITERAL),
+        ("#", URLKind.LITERAL),
+        ("#section", URLKind.LITERAL),
+        ("?page=2", URLKind.LITERAL),
+        ("https://example.com/", URLKind.LITERAL),
+        ("//example.com/", URLKind.LITERAL),
+        ("fake-view", URLKind.NAME),
+        ("admin:index", URLKind.NAME),
+        ("mailto:someone@example.com", URLKind.NAME),
+        (reverse_lazy("fake-view"), URLKind.LAZY),
+        (lambda: "/", URLKind.CALLABLE),
+    ],
+)
+def test_classify_url(spec, expected):
+    assert classify_url(spec) is expected